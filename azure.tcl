@@ -1,12 +1,20 @@
 # Copyright © 2021 rdbende <rdbende@gmail.com>
 
-source [file join [file dirname [info script]] theme light.tcl]
-source [file join [file dirname [info script]] theme dark.tcl]
+# The themes are sourced on first use, so only the images of the active
+# theme are loaded at startup
+set ::azure_theme_dir [file join [file dirname [info script]] theme]
 
 option add *tearOff 0
 
+proc load_theme {mode} {
+	if {[lsearch -exact [ttk::style theme names] "azure-$mode"] < 0} {
+		source [file join $::azure_theme_dir $mode.tcl]
+	}
+}
+
 proc set_theme {mode} {
 	if {$mode == "dark"} {
+		load_theme dark
 		ttk::style theme use "azure-dark"
 
 		array set colors {
@@ -46,6 +54,7 @@ proc set_theme {mode} {
         option add *Menu.selectcolor $colors(-fg)
     
 	} elseif {$mode == "light"} {
+		load_theme light
 		ttk::style theme use "azure-light"
 
         array set colors {
@@ -0,0 +1,425 @@
+################################################################################
+# Statisticus – Kommandozeile für Berichte, Export und Import (ohne Fenster)
+################################################################################
+# Braucht weder Tk noch einen Bildschirm, Diagramme werden mit matplotlib/Agg
+# als PNG geschrieben. Beispiele (z.B. aus cron):
+#
+#   python statisticus.py totals --year 2025
+#   python statisticus.py totals --month 2025-11 --group-by day --csv
+#   python statisticus.py totals --year 2025 --locations --export zweigstellen.xlsx
+#   python statisticus.py export --from 2025-11-01 --to 2025-11-30 november.csv
+#   python statisticus.py export --incremental uebergabe.csv
+#   python statisticus.py plot --month 2025-11 --png november.png
+#   python statisticus.py heatmap --year 2025 --columns valueb valuea --png auslastung.png
+#   python statisticus.py compare --month 2025-11 --years 3
+#   python statisticus.py report --year 2025 --out berichte
+#   python statisticus.py import alt.xlsx
+#   python statisticus.py rebuild-rollup
+#   python statisticus.py archive --vacuum
+#   python statisticus.py upgrade
+#   python statisticus.py maintain
+
+import argparse
+import csv
+import os
+import sys
+from datetime import date
+
+import statisticus_core as core
+
+
+# Zeitraum aus --year, --month oder --from/--to (jeweils inklusive);
+# ohne Angabe das laufende Jahr bis heute. Ergebnis: (erster Tag, letzter Tag)
+def selected_days(args):
+    today = date.today()
+    if args.year:
+        return date(args.year, 1, 1), date(args.year, 12, 31)
+    if args.month:
+        first = date.fromisoformat(args.month + "-01")
+        following = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+        return first, date.fromordinal(following.toordinal() - 1)
+    return args.date_from or date(today.year, 1, 1), args.date_to or today
+
+
+def add_range_arguments(parser):
+    group = parser.add_argument_group("Zeitraum (Standard: laufendes Jahr)")
+    group.add_argument("--year", type=int, help="Kalenderjahr, z.B. 2025")
+    group.add_argument("--month", help="Monat als JJJJ-MM")
+    group.add_argument("--from", dest="date_from", type=date.fromisoformat, metavar="JJJJ-MM-TT",
+                       help="Erster Tag")
+    group.add_argument("--to", dest="date_to", type=date.fromisoformat, metavar="JJJJ-MM-TT",
+                       help="Letzter Tag (inklusive)")
+    parser.add_argument("--columns", nargs="+", choices=core.VALUE_COLUMNS, default=core.VALUE_COLUMNS,
+                        metavar="SPALTE", help="Zählspalten (Standard: alle): " + ", ".join(core.VALUE_COLUMNS))
+
+
+# ---------------------------------------------------------------------------
+# Befehle
+# ---------------------------------------------------------------------------
+# Mit --locations je Standort aus statisticus.ini und zusammen ("Gesamt")
+def cmd_totals(args):
+    first, last = selected_days(args)
+    columns = tuple(args.columns)
+    span = core.day_range(first, last)
+    if args.locations is not None:
+        results = core.aggregate_locations(columns, *span, args.group_by, args.locations)
+    else:
+        results = {None: core.aggregate(columns, *span, group_by=args.group_by)}
+
+    header = ["Gruppe" if args.group_by else "Zeitraum", "Einträge"] + [core.COLUMN_LABELS[c] for c in columns]
+    if args.locations is not None:
+        header.insert(0, "Standort")
+    rows = []
+    for location, result in results.items():
+        for gruppe, values in result.items():
+            count = values[columns[0]]["count"]
+            rows.append(([location] if location else []) + [gruppe or f"{first} bis {last}", count] +
+                        [values[c]["sum"] for c in columns])
+
+    if args.export:
+        fmt = os.path.splitext(args.export)[1].lstrip(".").lower()
+        core.write_report(args.export, fmt, header, rows)
+        print(f"{len(rows)} Zeilen exportiert: {args.export}")
+        return 0
+
+    if args.csv:
+        writer = csv.writer(sys.stdout, delimiter=";", lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(rows)
+        return 0
+
+    labels = len(header) - len(columns) - 1
+    widths = [max(len(str(cell)) for cell in column) for column in zip(header, *rows)]
+    for row in [header] + rows:
+        print("  ".join(str(cell).ljust(width) if i < labels else str(cell).rjust(width)
+                        for i, (cell, width) in enumerate(zip(row, widths))))
+    return 0
+
+
+def cmd_export(args):
+    first, last = selected_days(args)
+    fmt = args.format or os.path.splitext(args.path)[1].lstrip(".").lower()
+    if fmt not in core.EXPORT_FORMATS:
+        print(f"Unbekanntes Format '{fmt}' – erlaubt: {', '.join(core.EXPORT_FORMATS)}", file=sys.stderr)
+        return 2
+
+    if args.incremental:
+        # ohne Zeitraumangabe alle Einträge, sonst bleibt der Zeitraum am Ziel hängen
+        explicit = args.year or args.month or args.date_from or args.date_to
+        span = core.day_range(first, last) if explicit else (None, None)
+        result = core.export_incremental(args.path, fmt, args.columns, *span)
+        if result["file"] is None:
+            print("Keine neuen Einträge seit dem letzten Export.", file=sys.stderr)
+        else:
+            print(f"{result['rows']} neue Zeilen exportiert: {result['file']} "
+                  f"(bis Eintrag {result['last_entry']})")
+        return 0
+
+    rows = core.export_data(args.path, fmt, args.columns, *core.day_range(first, last))
+    if rows == 0:
+        print("Keine Daten zum Exportieren.", file=sys.stderr)
+    else:
+        print(f"{rows} Zeilen exportiert: {args.path}")
+    return 0
+
+
+def cmd_plot(args):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    first, last = selected_days(args)
+    bucket, x, series = core.plot_series(args.columns, *core.day_range(first, last))
+    if not x:
+        print("Keine Daten im gewählten Zeitraum.", file=sys.stderr)
+        return 0
+
+    figure = Figure(figsize=(args.width / 100, args.height / 100), dpi=100)
+    FigureCanvasAgg(figure)
+    core.draw_series(figure.add_subplot(), bucket, x, series, f"{first} bis {last}")
+    figure.savefig(args.png)
+    print(f"Diagramm gespeichert: {args.png}")
+    return 0
+
+
+# Tabelle Wochentag × Stunde je Spalte (und Monat); --csv als Liste wie der Export
+def cmd_heatmap(args):
+    first, last = selected_days(args)
+    columns = tuple(args.columns)
+    span = core.day_range(first, last)
+    if args.export:
+        fmt = os.path.splitext(args.export)[1].lstrip(".").lower()
+        rows = core.export_heatmap(args.export, fmt, columns, *span, by_month=args.by_month)
+        print(f"{rows} Zeilen exportiert: {args.export}" if rows else "Keine Daten zum Exportieren.")
+        return 0
+
+    result = core.heatmap(columns, *span, by_month=args.by_month)
+    if not result:
+        print("Keine Daten im gewählten Zeitraum.", file=sys.stderr)
+        return 0
+
+    if args.png:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        for month, grids in result.items():
+            path = args.png
+            if month:
+                root, ext = os.path.splitext(args.png)
+                path = f"{root}_{month:02d}{ext}"
+            figure = Figure(figsize=(args.width / 100, args.height / 100), dpi=100)
+            FigureCanvasAgg(figure)
+            title = f"{first} bis {last}" + (f", {core.MONTH_LABELS[month - 1]}" if month else "")
+            if not core.draw_heatmap(figure, grids, title):
+                continue
+            figure.savefig(path)
+            print(f"Diagramm gespeichert: {path}")
+        return 0
+
+    if args.csv:
+        writer = csv.writer(sys.stdout, delimiter=";", lineterminator="\n")
+        writer.writerow((["Monat"] if args.by_month else []) + ["Wochentag", "Stunde"] +
+                        [core.COLUMN_LABELS[c] for c in columns])
+        for month, grids in result.items():
+            for day, label in enumerate(core.WEEKDAY_LABELS):
+                for hour in range(24):
+                    values = [grids[c][day][hour] for c in columns]
+                    if any(values):
+                        writer.writerow(([month] if month else []) + [label, hour] + values)
+        return 0
+
+    for month, grids in result.items():
+        hours = core.active_hours(grids)
+        for column, grid in grids.items():
+            print(core.COLUMN_LABELS[column] + (f" – {core.MONTH_LABELS[month - 1]}" if month else ""))
+            rows = [[""] + [str(h) for h in hours]] + \
+                   [[label] + [str(row[h]) for h in hours] for label, row in zip(core.WEEKDAY_LABELS, grid)]
+            widths = [max(len(cell) for cell in column) for column in zip(*rows)]
+            for row in rows:
+                print("  ".join(cell.rjust(width) for cell, width in zip(row, widths)))
+            print()
+    return 0
+
+
+# Zeitraum gegen dieselben Tage der Vorjahre: Summe, Differenz und Prozent
+# zum jeweils vorherigen Jahr
+def cmd_compare(args):
+    first, last = selected_days(args)
+    columns = tuple(args.columns)
+    if args.export:
+        fmt = os.path.splitext(args.export)[1].lstrip(".").lower()
+        core.export_comparison(args.export, fmt, columns, first, last, args.years)
+        print(f"Vergleich gespeichert: {args.export}")
+        return 0
+
+    periods = core.compare_periods(columns, first, last, args.years)
+    if args.png:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        figure = Figure(figsize=(args.width / 100, args.height / 100), dpi=100)
+        FigureCanvasAgg(figure)
+        core.draw_comparison(figure.add_subplot(), periods, f"{first} bis {last} und Vorjahre")
+        figure.savefig(args.png)
+        print(f"Diagramm gespeichert: {args.png}")
+        return 0
+
+    def signed(value, suffix=""):
+        return "" if value is None else f"{value:+}{suffix}"
+
+    header = ["Zeitraum", "Einträge"] + [f"{core.COLUMN_LABELS[c]}{part}" for c in columns
+                                         for part in ("", " Δ", " Δ %")]
+    rows = [[p["label"], p["count"]] + [cell for c in columns for cell in
+                                       (p["sums"][c], signed(p["delta"][c]), signed(p["percent"][c], " %"))]
+            for p in periods]
+    if args.csv:
+        writer = csv.writer(sys.stdout, delimiter=";", lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows([[p["label"], p["count"]] + [value for c in columns for value in
+                                                     (p["sums"][c], p["delta"][c], p["percent"][c])]
+                          for p in periods])
+        return 0
+
+    widths = [max(len(str(cell)) for cell in column) for column in zip(header, *rows)]
+    for row in [header] + rows:
+        print("  ".join(str(cell).ljust(width) if i == 0 else str(cell).rjust(width)
+                        for i, (cell, width) in enumerate(zip(row, widths))))
+    return 0
+
+
+# Ein Bericht je Monat (--year) bzw. je angegebenem Monat (--months)
+def cmd_report(args):
+    if args.months:
+        periods = []
+        for month in args.months:
+            first = date.fromisoformat(month + "-01")
+            periods.append(next(p for p in core.month_periods(first.year) if p[0] == month))
+    else:
+        periods = core.month_periods(args.year or date.today().year)
+    paths = core.batch_report(args.folder, periods, args.formats, args.columns, args.processes)
+    for path in paths:
+        print(path)
+    print(f"{len(paths)} Dateien für {len(periods)} Zeiträume geschrieben.")
+    return 0
+
+
+def cmd_import(args):
+    summary = core.import_file(args.path)
+    print(f"{summary['imported']} Zeilen importiert, {summary['rejected']} abgelehnt "
+          f"({summary['imported'] / max(summary['seconds'], 1e-9):.0f} Zeilen/s)")
+    if summary["rejects_path"]:
+        print(f"Abgelehnte Zeilen: {summary['rejects_path']}")
+    return 1 if summary["rejected"] else 0
+
+
+def cmd_rebuild_rollup(args):
+    core.rebuild_rollup()
+    return 0
+
+
+def cmd_archive(args):
+    moved = core.archive_years(args.through)
+    for year, rows in moved.items():
+        print(f"{year}: {rows} Zeilen nach {core.archive_file_name(year)} verschoben")
+    if not moved:
+        print("Keine abgeschlossenen Jahre in der Hauptdatei.")
+    if args.vacuum and moved:
+        core.db.execute("VACUUM")
+    return 0
+
+
+def cmd_upgrade(args):
+    for path, rows in core.upgrade(args.batch).items():
+        print(f"{path}: {rows} Zeilen umgestellt" if rows else f"{path}: bereits aktuell")
+    if args.vacuum:
+        core.db.execute("VACUUM")
+    return 0
+
+
+def cmd_maintain(args):
+    if args.enable_incremental_vacuum:
+        core.enable_incremental_vacuum()
+        print("auto_vacuum = INCREMENTAL eingeschaltet.")
+    if args.backup_only:
+        print(f"Sicherung: {core.backup(args.dir, args.keep)}")
+        return 0
+    result = core.maintain(force=not args.if_due)
+    print(f"Sicherung: {result['backup'] or 'nicht fällig'}")
+    print(f"Statistiken aufgefrischt, {result['released']} freie Seiten freigegeben.")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="statisticus",
+                                     description="Statisticus – Berichte, Export und Import ohne Fenster")
+    parser.add_argument("--db", metavar="DATEI", help=f"Datenbankdatei (Standard: {core.DB_NAME})")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="BEFEHL")
+
+    totals = commands.add_parser("totals", help="Summen für einen Zeitraum ausgeben")
+    add_range_arguments(totals)
+    totals.add_argument("--group-by", choices=[g for g in core.GROUPINGS if g] + list(core.RAW_GROUPINGS),
+                        help="Summen je Tag, Woche, Monat, Stunde des Tages oder einzelner Stunde")
+    totals.add_argument("--locations", nargs="*", metavar="NAME",
+                        help="Je Standort aus statisticus.ini [locations] und zusammen (ohne Namen: alle)")
+    output = totals.add_mutually_exclusive_group()
+    output.add_argument("--csv", action="store_true", help="Als CSV (;) statt als Tabelle ausgeben")
+    output.add_argument("--export", metavar="DATEI", help="Als Excel- oder CSV-Datei speichern")
+    totals.set_defaults(func=cmd_totals)
+
+    export = commands.add_parser("export", help="Rohdaten eines Zeitraums exportieren")
+    add_range_arguments(export)
+    export.add_argument("--format", choices=list(core.EXPORT_FORMATS),
+                        help="Dateiformat (Standard: nach der Dateiendung)")
+    export.add_argument("--incremental", action="store_true",
+                        help="Nur Einträge seit dem letzten Lauf anhängen (Stand in DATEI.manifest.json)")
+    export.add_argument("path", metavar="DATEI")
+    export.set_defaults(func=cmd_export)
+
+    plot = commands.add_parser("plot", help="Diagramm eines Zeitraums als PNG speichern")
+    add_range_arguments(plot)
+    plot.add_argument("--png", required=True, metavar="DATEI", help="Zieldatei")
+    plot.add_argument("--width", type=int, default=1000, help="Breite in Pixel (Standard: 1000)")
+    plot.add_argument("--height", type=int, default=500, help="Höhe in Pixel (Standard: 500)")
+    plot.set_defaults(func=cmd_plot)
+
+    heat = commands.add_parser("heatmap", help="Auslastung nach Wochentag und Stunde")
+    add_range_arguments(heat)
+    heat.add_argument("--by-month", action="store_true", help="Je Kalendermonat getrennt")
+    output = heat.add_mutually_exclusive_group()
+    output.add_argument("--csv", action="store_true", help="Als CSV (;) statt als Tabelle ausgeben")
+    output.add_argument("--png", metavar="DATEI", help="Als Bild speichern (mit --by-month eines je Monat)")
+    output.add_argument("--export", metavar="DATEI", help="Als Excel- oder CSV-Datei speichern")
+    heat.add_argument("--width", type=int, default=1000, help="Breite in Pixel (Standard: 1000)")
+    heat.add_argument("--height", type=int, default=800, help="Höhe in Pixel (Standard: 800)")
+    heat.set_defaults(func=cmd_heatmap)
+
+    comparison = commands.add_parser("compare", help="Zeitraum mit denselben Tagen der Vorjahre vergleichen")
+    add_range_arguments(comparison)
+    comparison.add_argument("--years", type=int, default=1, help="Anzahl Vorjahre (Standard: 1)")
+    output = comparison.add_mutually_exclusive_group()
+    output.add_argument("--csv", action="store_true", help="Als CSV (;) statt als Tabelle ausgeben")
+    output.add_argument("--png", metavar="DATEI", help="Als Balkendiagramm speichern")
+    output.add_argument("--export", metavar="DATEI", help="Als Excel- oder CSV-Datei speichern")
+    comparison.add_argument("--width", type=int, default=1000, help="Breite in Pixel (Standard: 1000)")
+    comparison.add_argument("--height", type=int, default=500, help="Höhe in Pixel (Standard: 500)")
+    comparison.set_defaults(func=cmd_compare)
+
+    report = commands.add_parser("report", help="Bericht (PDF/PNG/Excel) je Monat in einen Ordner schreiben")
+    months = report.add_mutually_exclusive_group()
+    months.add_argument("--year", type=int, help="Alle Monate dieses Jahres (Standard: laufendes Jahr)")
+    months.add_argument("--months", nargs="+", metavar="JJJJ-MM", help="Nur diese Monate")
+    report.add_argument("--formats", nargs="+", choices=core.REPORT_OUTPUTS, default=["pdf", "xlsx"],
+                        help="Ausgabeformate (Standard: pdf xlsx)")
+    report.add_argument("--columns", nargs="+", choices=core.VALUE_COLUMNS, default=core.VALUE_COLUMNS,
+                        metavar="SPALTE", help="Zählspalten (Standard: alle)")
+    report.add_argument("--processes", type=int, help="Anzahl Prozesse (Standard: Zahl der CPU-Kerne)")
+    report.add_argument("--out", dest="folder", required=True, metavar="ORDNER", help="Zielordner")
+    report.set_defaults(func=cmd_report)
+
+    importer = commands.add_parser("import", help="Historische Zählungen aus CSV/XLSX importieren")
+    importer.add_argument("path", metavar="DATEI")
+    importer.set_defaults(func=cmd_import)
+
+    rebuild = commands.add_parser("rebuild-rollup", help="Tagessummen aus den Rohdaten neu aufbauen")
+    rebuild.set_defaults(func=cmd_rebuild_rollup)
+
+    archive = commands.add_parser("archive", help="Abgeschlossene Jahre in eigene Archivdateien verschieben")
+    archive.add_argument("--through", type=int, metavar="JAHR",
+                         help="Bis einschließlich dieses Jahres (Standard: Vorjahr)")
+    archive.add_argument("--vacuum", action="store_true", help="Hauptdatei danach verkleinern (VACUUM)")
+    archive.set_defaults(func=cmd_archive)
+
+    upgrade = commands.add_parser("upgrade", help="Hauptdatei und Archive auf Schema v3 umstellen")
+    upgrade.add_argument("--batch", type=int, default=core.UPGRADE_BATCH,
+                         help=f"Zeilen je Transaktion (Standard: {core.UPGRADE_BATCH})")
+    upgrade.add_argument("--vacuum", action="store_true", help="Hauptdatei danach verkleinern (VACUUM)")
+    upgrade.set_defaults(func=cmd_upgrade)
+
+    maintain = commands.add_parser("maintain",
+                                   help="Sicherung, Statistiken und freie Seiten (läuft neben der Eingabe)")
+    maintain.add_argument("--if-due", action="store_true",
+                          help="Sicherung nur, wenn die letzte älter als backup_hours ist (für geplante Aufgaben)")
+    maintain.add_argument("--backup-only", action="store_true", help="Nur sichern")
+    maintain.add_argument("--dir", metavar="ORDNER", help="Zielordner der Sicherung (nur mit --backup-only)")
+    maintain.add_argument("--keep", type=int, help="Anzahl aufbewahrter Sicherungen (nur mit --backup-only)")
+    maintain.add_argument("--enable-incremental-vacuum", action="store_true",
+                          help="Einmalig auto_vacuum = INCREMENTAL einschalten (schreibt die Datei neu, "
+                               "nur ohne laufende Eingabe)")
+    maintain.set_defaults(func=cmd_maintain)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.db:
+        core.open_database(args.db)
+    try:
+        return args.func(args)
+    except (ValueError, OSError, RuntimeError) as exc:
+        print(f"Fehler: {exc}", file=sys.stderr)
+        return 1
+    finally:
+        core.db.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
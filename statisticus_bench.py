@@ -0,0 +1,350 @@
+################################################################################
+# Statisticus – Testdaten und Benchmarks
+################################################################################
+# Erzeugt synthetische Datenbanken mit realistischem Verlauf (Öffnungszeiten,
+# Wochentage, Semester/Ferien) und misst die zeitkritischen Wege: Jahreszähler,
+# Analyzer-Summen, Diagrammdaten, Export und Speichern. Ergebnisse als JSON,
+# damit Versionen verglichen werden können.
+#
+#   python statisticus_bench.py generate --rows 1000000 --years 5 test.db
+#   python statisticus_bench.py run --sizes 10000 1000000 10000000 --out bench.json
+#   python statisticus_bench.py compare alt.json neu.json
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import statisticus_core as core
+
+# ---------------------------------------------------------------------------
+# Testdaten
+# ---------------------------------------------------------------------------
+# Öffnungszeiten je Wochentag (1 = Montag): erste und letzte volle Stunde
+OPENING_HOURS = {1: (9, 19), 2: (9, 19), 3: (9, 19), 4: (9, 19), 5: (9, 17), 6: (10, 13)}
+# Geschlossen (Monat, Tag) zusätzlich zu den Sonntagen
+CLOSED_DAYS = {(1, 1), (1, 6), (5, 1), (8, 15), (10, 26), (11, 1), (12, 8)} | {(12, d) for d in range(24, 32)}
+
+HOUR_WEIGHTS = {9: 0.6, 10: 1.0, 11: 1.3, 12: 1.2, 13: 1.1, 14: 1.3, 15: 1.3,
+                16: 1.2, 17: 1.0, 18: 0.8, 19: 0.5}
+WEEKDAY_WEIGHTS = {1: 1.15, 2: 1.1, 3: 1.05, 4: 1.0, 5: 0.8, 6: 0.5}
+# Semester hoch, Prüfungszeit (Jänner, Juni) am höchsten, Sommerferien niedrig
+MONTH_WEIGHTS = {1: 1.3, 2: 0.7, 3: 1.1, 4: 1.1, 5: 1.2, 6: 1.3,
+                 7: 0.6, 8: 0.4, 9: 0.8, 10: 1.2, 11: 1.2, 12: 0.9}
+
+# Werte eines Eintrags: (mögliche Werte, Gewichte)
+VALUE_CHOICES = {
+    "valueb": ((0, 1, 2, 3, 4), (10, 60, 18, 8, 4)),
+    "valueks": ((0, 1, 2, 5, 10, 20), (70, 12, 8, 5, 3, 2)),
+    "valuea": ((0, 1, 2), (65, 30, 5)),
+    "valuev": ((0, 1, 2, 3), (20, 60, 15, 5)),
+}
+
+GENERATE_BATCH = 50_000
+
+
+# Gewicht jeder offenen Stunde im Zeitraum: [(Tag, Stunde, Gewicht)]
+def opening_slots(first, last):
+    slots = []
+    day = first
+    while day <= last:
+        weekday = day.isoweekday()
+        if weekday in OPENING_HOURS and (day.month, day.day) not in CLOSED_DAYS:
+            day_weight = WEEKDAY_WEIGHTS[weekday] * MONTH_WEIGHTS[day.month]
+            start, end = OPENING_HOURS[weekday]
+            slots.extend((day, hour, day_weight * HOUR_WEIGHTS[hour]) for hour in range(start, end + 1))
+        day += timedelta(days=1)
+    return slots
+
+
+# Etwa "rows" Einträge im Zeitraum, verteilt nach den Gewichten; lokale Zeit
+# wird wie beim Import in Unix-Sekunden umgerechnet (Zeitzone der Maschine)
+def synthetic_rows(rows, first, last, rng):
+    slots = opening_slots(first, last)
+    scale = rows / sum(weight for _, _, weight in slots)
+    values = {c: VALUE_CHOICES[c] for c in core.VALUE_COLUMNS}
+
+    for day, hour, weight in slots:
+        expected = weight * scale
+        count = int(expected + rng.random())
+        if not count:
+            continue
+        start = int(datetime(day.year, day.month, day.day, hour).timestamp())
+        drawn = {c: rng.choices(choices, weights, k=count) for c, (choices, weights) in values.items()}
+        seconds = sorted(rng.randrange(3600) for _ in range(count))
+        for i, second in enumerate(seconds):
+            yield {
+                "today": start + second,
+                "valueb": drawn["valueb"][i],
+                "valueks": drawn["valueks"][i],
+                "valuea": drawn["valuea"][i],
+                "valuev": drawn["valuev"][i],
+            }
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Neue Datenbank mit etwa "rows" Einträgen über "years" Jahre bis heute.
+# Die Tagessummen-Trigger sind beim Massen-Insert entfernt und werden danach
+# samt Tagessummen neu angelegt (wie Migration 5) – alles in einer Transaktion.
+def generate(path, rows, years, seed=1):
+    if os.path.exists(path):
+        raise ValueError(f"Datei existiert bereits: {path}")
+
+    last = date.today()
+    first = last - timedelta(days=round(365.25 * years))
+    rng = random.Random(seed)
+    started = time.perf_counter()
+
+    database = core.open_database(path)
+    with database.transaction() as conn:
+        for statement in core.split_sql(core.drop_triggers_sql()):
+            conn.execute(statement)
+        for batch in batched(synthetic_rows(rows, first, last, rng), GENERATE_BATCH):
+            conn.executemany(core.INSERT_SQL, batch)
+        for statement in core.split_sql(core.rollup_sql(core.ROLLUP_DAY, core.ROLLUP_DAY_ROWS)):
+            conn.execute(statement)
+    database.execute("ANALYZE")
+    count = database.execute("SELECT COUNT(*) FROM Statistik").fetchone()[0]
+    core.cache.invalidate()
+
+    return {"rows": count, "first_day": str(first), "last_day": str(last),
+            "seconds": round(time.perf_counter() - started, 3)}
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+# Jede Messung: name → Funktion ohne Argumente, liefert die Zahl der
+# verarbeiteten Zeilen/Gruppen (oder None). "cold" = Abfrage-Cache vorher
+# geleert, "warm" = Ergebnis aus dem Cache.
+def benchmarks(workdir):
+    today = date.today()
+    year = core.year_range(today.year)
+    last_365 = core.day_range(today - timedelta(days=364), today)
+    last_30 = core.day_range(today - timedelta(days=29), today)
+    first_day = core.db.execute("SELECT MIN(tag) FROM StatistikTag").fetchone()[0] or str(today)
+    everything = (first_day, str(today + timedelta(days=1)))
+    columns = core.VALUE_COLUMNS
+
+    def cold(function):
+        def run():
+            core.cache.invalidate()
+            return function()
+        return run
+
+    def year_totals():
+        return len(core.get_year_totals())
+
+    def analyzer_totals(span):
+        return lambda: core.aggregate(columns, *span)[None]["valueb"]["count"]
+
+    def plot_data(span):
+        return lambda: len(core.plot_series(columns, *span)[1])
+
+    def export(fmt, span):
+        path = os.path.join(workdir, f"bench_export.{fmt}")
+        def run():
+            rows = core.export_data(path, fmt, columns, *span)
+            if os.path.exists(path):
+                os.remove(path)
+            return rows
+        return run
+
+    # Speichern: insert_data + neu gelesene Jahreszähler bzw. wie im
+    # Eingabefenster über CounterWatcher (nur der neue Eintrag wird gelesen)
+    def save_entry():
+        core.insert_data(1, 0, 0, 1)
+        return len(core.get_year_totals())
+
+    watcher = core.CounterWatcher()
+
+    def save_entry_watched():
+        core.insert_data(1, 0, 0, 1)
+        return len(watcher.refresh())
+
+    # Analyzer mit Schnappschuss (nur mit numpy): einmal laden, dann je
+    # Abfrage refresh + Summe
+    snapshot = core.TotalsSnapshot()
+
+    def snapshot_load():
+        snapshot.load()
+        return len(snapshot.days)
+
+    def snapshot_totals(span):
+        def run():
+            if not snapshot.loaded():
+                snapshot.load()
+            snapshot.refresh()
+            return snapshot.totals(columns, *span)["valueb"]
+        return run
+
+    extra = {}
+    if core.snapshot_from_settings() is not None:
+        extra = {
+            "snapshot_load": snapshot_load,
+            "snapshot_totals_365d": snapshot_totals(last_365),
+            "snapshot_totals_all": snapshot_totals(everything),
+        }
+
+    return {
+        "get_year_totals_cold": cold(year_totals),
+        "get_year_totals_warm": year_totals,
+        "analyzer_totals_365d": cold(analyzer_totals(last_365)),
+        "analyzer_totals_all": cold(analyzer_totals(everything)),
+        "analyzer_totals_by_day_365d": cold(lambda: len(core.aggregate(columns, *last_365, group_by="day"))),
+        "analyzer_totals_by_hour_365d": cold(lambda: len(core.aggregate(columns, *last_365, group_by="hour"))),
+        "plot_data_30d": cold(plot_data(last_30)),
+        "plot_data_365d": cold(plot_data(last_365)),
+        "plot_data_all": cold(plot_data(everything)),
+        "export_csv_30d": export("csv", last_30),
+        "export_xlsx_30d": export("xlsx", last_30),
+        "insert_and_update_counters": save_entry,
+        "insert_and_watch_counters": save_entry_watched,
+        "watch_counters_idle": watcher.changed,
+        **extra,
+    }
+
+
+def measure(function, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        times.append((time.perf_counter() - started) * 1000)
+    return {
+        "runs": repeat,
+        "min_ms": round(min(times), 3),
+        "median_ms": round(statistics.median(times), 3),
+        "max_ms": round(max(times), 3),
+        "result": result,
+    }
+
+
+def version_label():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Datenbanken je Größe in workdir (bench_<Zeilen>.db) werden wiederverwendet,
+# damit wiederholte Läufe nicht jedes Mal neu generieren
+def run(sizes, years, repeat, workdir, only=None, seed=1, label=None):
+    os.makedirs(workdir, exist_ok=True)
+    report = {
+        "label": label or version_label(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "sizes": {},
+    }
+
+    for size in sizes:
+        path = os.path.join(workdir, f"bench_{size}.db")
+        entry = {}
+        if not os.path.exists(path):
+            print(f"[{size}] Testdaten werden erzeugt …", file=sys.stderr)
+            entry["generate"] = generate(path, size, years, seed)
+        else:
+            core.open_database(path)
+        entry["rows"] = core.db.execute("SELECT COUNT(*) FROM Statistik").fetchone()[0]
+        entry["db_bytes"] = os.path.getsize(path)
+        entry["benchmarks"] = {}
+
+        for name, function in benchmarks(workdir).items():
+            if only and name not in only:
+                continue
+            result = measure(function, repeat)
+            entry["benchmarks"][name] = result
+            print(f"[{size}] {name}: {result['median_ms']:.1f} ms", file=sys.stderr)
+
+        report["sizes"][str(size)] = entry
+        core.db.close()
+    return report
+
+
+# Mediane zweier Berichte gegenüberstellen (Faktor > 1 = langsamer geworden)
+def compare(old, new):
+    lines = []
+    for size, entry in new["sizes"].items():
+        before = old["sizes"].get(size, {}).get("benchmarks", {})
+        for name, result in entry["benchmarks"].items():
+            if name not in before:
+                continue
+            ratio = result["median_ms"] / max(before[name]["median_ms"], 1e-9)
+            lines.append(f"{size:>10}  {name:<32} {before[name]['median_ms']:>10.1f} → "
+                         f"{result['median_ms']:>10.1f} ms  ×{ratio:.2f}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Statisticus – Testdaten und Benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="BEFEHL")
+
+    gen = commands.add_parser("generate", help="Synthetische Datenbank erzeugen")
+    gen.add_argument("--rows", type=int, default=100_000, help="Ungefähre Zahl der Einträge")
+    gen.add_argument("--years", type=float, default=3, help="Zeitraum in Jahren bis heute")
+    gen.add_argument("--seed", type=int, default=1)
+    gen.add_argument("path", metavar="DATEI")
+
+    bench = commands.add_parser("run", help="Benchmarks ausführen, Ergebnis als JSON")
+    bench.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    bench.add_argument("--years", type=float, default=5, help="Zeitraum der Testdaten in Jahren")
+    bench.add_argument("--repeat", type=int, default=5, help="Wiederholungen je Messung")
+    bench.add_argument("--dir", default=os.path.join(tempfile.gettempdir(), "statisticus_bench"),
+                       help="Ordner für die Testdatenbanken (werden wiederverwendet)")
+    bench.add_argument("--only", nargs="+", metavar="NAME", help="Nur diese Messungen")
+    bench.add_argument("--label", help="Bezeichnung im Bericht (Standard: git describe)")
+    bench.add_argument("--seed", type=int, default=1)
+    bench.add_argument("--out", metavar="DATEI", help="JSON-Datei (Standard: Ausgabe)")
+
+    cmp = commands.add_parser("compare", help="Zwei JSON-Berichte vergleichen")
+    cmp.add_argument("old", metavar="ALT")
+    cmp.add_argument("new", metavar="NEU")
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "generate":
+            print(json.dumps(generate(args.path, args.rows, args.years, args.seed)))
+        elif args.command == "run":
+            report = run(args.sizes, args.years, args.repeat, args.dir, args.only, args.seed, args.label)
+            text = json.dumps(report, indent=2, ensure_ascii=False)
+            if args.out:
+                with open(args.out, "w", encoding="utf-8") as file:
+                    file.write(text + "\n")
+            else:
+                print(text)
+        else:
+            with open(args.old, encoding="utf-8") as old, open(args.new, encoding="utf-8") as new:
+                print("\n".join(compare(json.load(old), json.load(new))))
+    except (ValueError, OSError) as exc:
+        print(f"Fehler: {exc}", file=sys.stderr)
+        return 1
+    finally:
+        core.db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
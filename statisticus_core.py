@@ -0,0 +1,2436 @@
+################################################################################
+# Statisticus – Datenbank, Auswertung, Export und Import (ohne Tk)
+################################################################################
+# Wird von der Eingabe (statisticus_prod.py) und der Kommandozeile
+# (statisticus.py) importiert. Der Import hat keine Nebenwirkungen: die
+# Datenbankdatei wird erst bei der ersten Abfrage geöffnet und migriert.
+# matplotlib, numpy, openpyxl und pyarrow werden erst bei Bedarf geladen.
+
+import time
+from datetime import date, datetime, timedelta, timezone
+import sqlite3
+import configparser
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import pathlib
+import re
+import threading
+import urllib.parse
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import lru_cache
+
+DB_NAME = "statisticus.db"
+
+# Zählspalten der Tabelle Statistik – einzige erlaubte Spaltennamen in SQL
+VALUE_COLUMNS = ("valueb", "valueks", "valuea", "valuev")
+COLUMN_LABELS = {"valueb": "BenutzerIn", "valueks": "Kopie/Scan",
+                 "valuea": "Anfrage", "valuev": "BesucherIn"}
+
+# Vor jedem Einsetzen von Spaltennamen in SQL
+def check_columns(columns):
+    if not columns or not set(columns) <= set(VALUE_COLUMNS):
+        raise ValueError(f"Unbekannte Spalten: {columns}")
+
+# ---------------------------------------------------------------------------
+# Einstellungen
+# ---------------------------------------------------------------------------
+# Optional "statisticus.ini" im Ordner der Datenbank (auch mit --db); fehlende
+# Datei oder Werte → Standardwerte. Gelesen wird erst bei der ersten Verwendung.
+CONFIG_NAME = "statisticus.ini"
+CONFIG_DEFAULTS = {
+    "database": {
+        "journal_mode": "wal",                  # wal: Datei auf lokaler Platte; delete: Netzwerkfreigabe
+    },
+    "timing": {
+        "slow_ms": "500",                       # ab hier als langsam protokolliert
+        "history": "500",                       # Vorgänge im Speicher (Ringpuffer)
+        "log_file": "statisticus_timing.log",
+        "log_max_kb": "1024",
+        "log_backups": "3",
+        "log_all": "no",                        # auch schnelle Vorgänge protokollieren
+        "status_bar": "no",                     # letzte Dauer im Eingabefenster anzeigen
+        "trace_sql": "no",                      # SQL + EXPLAIN QUERY PLAN protokollieren
+    },
+    "buffer": {
+        "enabled": "no",                        # Eingaben gesammelt schreiben (EntryBuffer)
+        "flush_seconds": "5",
+        "flush_count": "20",
+        "journal": "",                          # Standard: statisticus_<Rechner>_<Benutzer>.journal
+    },
+    "analyzer": {
+        "snapshot": "yes",                      # Summen aus TotalsSnapshot (braucht numpy)
+    },
+    "counters": {
+        "poll_seconds": "3",                    # Änderungen anderer Plätze so oft prüfen
+        "resync_minutes": "15",                 # Jahreszähler so oft ganz neu lesen
+    },
+    "maintenance": {
+        "enabled": "no",                        # Wartung im Eingabefenster, wenn es ruht
+        "idle_minutes": "5",                    # ... so lange ohne Eingabe
+        "backup_hours": "24",                   # Sicherung höchstens so oft
+        "backup_dir": "backups",                # relativ zum Ordner der Datenbank
+        "keep": "7",                            # Anzahl aufbewahrter Sicherungen
+        "step_pages": "256",                    # Seiten je Schritt (Sicherung, incremental_vacuum)
+        "step_pause_ms": "20",                  # Pause zwischen den Schritten
+    },
+}
+
+def config_path(db_path=None):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path or db.path)), CONFIG_NAME)
+
+def settings(path=None):
+    return read_settings(path or config_path())
+
+@lru_cache(maxsize=None)
+def read_settings(path):
+    config = configparser.ConfigParser()
+    config.read_dict(CONFIG_DEFAULTS)
+    config.read(path, encoding="utf-8")
+    return config
+
+
+# ---------------------------------------------------------------------------
+# Zeitmessung
+# ---------------------------------------------------------------------------
+# Dauer und Zeilenzahl jedes DB-Zugriffs, jeder Auswertung und jedes Exports
+# landen im Ringpuffer (recent/last); ab slow_ms zusätzlich im rotierenden
+# Protokoll, mit log_all jeder Vorgang. trace_sql schreibt jede Anweisung und
+# für jede neue Abfrage den EXPLAIN QUERY PLAN dazu.
+class Timings:
+    MAX_PLANS = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records = None
+        self._plans = {}
+        self.log = logging.getLogger("statisticus.timing")
+
+    def _setup(self):
+        config = settings()["timing"]
+        self.slow_ms = config.getfloat("slow_ms")
+        self.log_all = config.getboolean("log_all")
+        self.trace_sql = config.getboolean("trace_sql")
+        self.status_bar = config.getboolean("status_bar")
+        self._records = deque(maxlen=config.getint("history"))
+        if self.log.handlers:
+            return
+        # Protokoll neben der Datenbank, nur im Hauptprozess: Pool-Prozesse
+        # (Zweigstellen, Berichte), die dieselbe Datei rotieren, überschrieben
+        # sich gegenseitig – dort nur Ringpuffer (siehe pool_process_setup)
+        if config["log_file"] and multiprocessing.parent_process() is None:
+            from logging.handlers import RotatingFileHandler
+            path = os.path.join(os.path.dirname(os.path.abspath(db.path)), config["log_file"])
+            handler = RotatingFileHandler(path, maxBytes=config.getint("log_max_kb") * 1024,
+                                          backupCount=config.getint("log_backups"), encoding="utf-8",
+                                          delay=True)
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(threadName)s] %(message)s"))
+        else:
+            handler = logging.NullHandler()
+        self.log.addHandler(handler)
+        self.log.setLevel(logging.INFO)
+        self.log.propagate = False
+
+    # Initializer der Pool-Prozesse: ein per fork geerbtes Dateiprotokoll abhängen
+    def detach_log(self):
+        for handler in list(self.log.handlers):
+            self.log.removeHandler(handler)
+        self.log.addHandler(logging.NullHandler())
+        self.log.propagate = False
+
+    def configured(self):
+        if self._records is None:
+            with self._lock:
+                if self._records is None:
+                    self._setup()
+        return self
+
+    # with timings.measure("name") as record: ... record["rows"] = n
+    @contextmanager
+    def measure(self, name, rows=None):
+        record = {"name": name, "rows": rows, "at": time.time()}
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["ms"] = (time.perf_counter() - started) * 1000
+            self.add(record)
+
+    def add(self, record):
+        self.configured()
+        with self._lock:
+            self._records.append(record)
+        rows = "" if record["rows"] is None else f", {record['rows']} Zeilen"
+        if record["ms"] >= self.slow_ms:
+            self.log.warning("LANGSAM %s: %.1f ms%s", record["name"], record["ms"], rows)
+        elif self.log_all:
+            self.log.info("%s: %.1f ms%s", record["name"], record["ms"], rows)
+
+    def last(self):
+        with self._lock:
+            return self._records[-1] if self._records else None
+
+    def recent(self, count=None):
+        with self._lock:
+            records = list(self._records or ())
+        return records[-count:] if count else records
+
+    # sqlite3-Trace-Callback (siehe Database.connection): jede Anweisung mit
+    # eingesetzten Werten, ohne die EXPLAINs von plan()
+    def trace(self, sql):
+        if sql.startswith("--") or sql.startswith("EXPLAIN"):
+            return
+        self.log.info("SQL %s", " ".join(sql.split()))
+
+    # Aus Database.execute: EXPLAIN QUERY PLAN über die ausführende Verbindung
+    # (mit ihren angehängten Archiven), einmal je SQL-Text mit Platzhaltern –
+    # andere Werte für dieselbe Abfrage ergeben keinen neuen Eintrag
+    def plan(self, conn, sql, params):
+        if sql.split(None, 1)[0].upper() not in ("SELECT", "WITH"):
+            return
+        with self._lock:
+            if sql in self._plans or len(self._plans) >= self.MAX_PLANS:
+                return
+            self._plans[sql] = None
+        try:
+            plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        except sqlite3.Error as exc:
+            plan = [f"(kein Plan: {exc})"]
+        self._plans[sql] = plan
+        self.log.info("PLAN %s\n    %s", " ".join(sql.split()), "\n    ".join(plan))
+
+
+timings = Timings()
+
+def pool_process_setup():
+    timings.detach_log()
+
+
+# Kurzname einer SQL-Anweisung für die Zeitmessung, z.B. "SELECT Statistik"
+SQL_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+(\w+)", re.IGNORECASE)
+
+@lru_cache(maxsize=256)
+def sql_name(sql):
+    table = SQL_TABLE.search(sql)
+    return f"{sql.split(None, 1)[0].upper()} {table.group(1) if table else ''}".strip()
+
+
+# ---------------------------------------------------------------------------
+# Datenbankverbindung
+# ---------------------------------------------------------------------------
+# Eine Verbindung pro Thread, einmal geöffnet und bis zum Programmende
+# wiederverwendet (inkl. Cache der vorbereiteten Statements). WAL erlaubt
+# Lesen während andere Plätze schreiben; busy_timeout wartet auf die
+# Schreibsperre statt sofort "database is locked" zu melden.
+# WAL braucht gemeinsamen Speicher – alle Plätze müssen die Datei über dasselbe
+# lokale Dateisystem öffnen. Liegt sie auf einer Netzwerkfreigabe, muss in der
+# statisticus.ini daneben journal_mode = delete stehen (Rollback-Journal:
+# Lesen wartet dann auf laufende Schreibvorgänge). Der Modus wird in der Datei
+# gespeichert; umgestellt wird er nur, wenn kein anderer Platz sie offen hat.
+JOURNAL_MODES = {"wal": "NORMAL", "delete": "FULL"}         # Modus → synchronous
+JOURNAL_MODE_MESSAGE = ("Die Datenbank {path} läuft noch im Journalmodus {current}, eingestellt ist "
+                        "{mode} – bitte alle Plätze beenden und neu starten.")
+OLD_DATABASE_MESSAGE = ("Die Datenbank {path} hat noch das alte Format – bitte dort zuerst "
+                        "'python statisticus.py upgrade' ausführen.")
+OLD_ARCHIVE_MESSAGE = ("Die Archivdatei {path} hat noch das alte Format – bitte zuerst "
+                       "'python statisticus.py upgrade' ausführen.")
+
+# SQLite-URI mit leerer Authority: Path.as_uri() macht aus \\server\freigabe\x.db
+# "file://server/…", das SQLite ablehnt; hier wird daraus "file:////server/…"
+def readonly_uri(path):
+    text = pathlib.Path(path).resolve().as_posix()
+    if not text.startswith("/"):
+        text = "/" + text                                   # C:/… → /C:/…
+    return "file://" + urllib.parse.quote(text, safe="/:") + "?mode=ro"
+
+
+# readonly: Datei (z.B. einer anderen Zweigstelle) nur lesen – ohne
+# Migration, das Schema muss bereits v3 sein.
+class Database:
+    def __init__(self, path, timeout=15.0, auto_migrate=True, readonly=False):
+        self.path = path
+        self.timeout = timeout
+        self.readonly = readonly
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._migrated = not auto_migrate or readonly
+        self._migrate_lock = threading.Lock()
+
+    # Die erste Verbindung bringt das Schema auf den aktuellen Stand. Erst
+    # danach gilt sie als geöffnet – schlägt die Migration fehl (z.B. weil ein
+    # anderer Platz gerade migriert), wird sie geschlossen und der nächste
+    # Aufruf versucht es erneut.
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(readonly_uri(self.path) if self.readonly else self.path, timeout=self.timeout,
+                                   isolation_level=None, uri=True, check_same_thread=False, cached_statements=256)
+            try:
+                if self.readonly:
+                    if conn.execute("PRAGMA user_version").fetchone()[0] < V3_VERSION:
+                        raise RuntimeError(OLD_DATABASE_MESSAGE.format(path=self.path))
+                else:
+                    mode = settings(config_path(self.path))["database"]["journal_mode"].strip().lower()
+                    if mode not in JOURNAL_MODES:
+                        raise ValueError(f"Unbekannter journal_mode {mode!r} – erlaubt: {', '.join(JOURNAL_MODES)}")
+                    try:
+                        current = conn.execute(f"PRAGMA journal_mode = {mode}").fetchone()[0]
+                    except sqlite3.OperationalError:
+                        # Aus WAL heraus nur ohne andere Verbindungen ("database is locked")
+                        current = conn.execute("PRAGMA journal_mode").fetchone()[0]
+                    if current != mode:
+                        raise RuntimeError(JOURNAL_MODE_MESSAGE.format(path=self.path, current=current, mode=mode))
+                    conn.execute(f"PRAGMA synchronous = {JOURNAL_MODES[mode]}")
+                conn.execute(f"PRAGMA busy_timeout = {int(self.timeout * 1000)}")
+                if timings.configured().trace_sql:
+                    conn.set_trace_callback(timings.trace)
+                # migrate() arbeitet über self.transaction() mit dieser Verbindung
+                self._local.conn = conn
+                self._local.attached = {}
+                if not self._migrated:
+                    with self._migrate_lock:
+                        if not self._migrated:
+                            migrate(self)
+                            self._migrated = True
+            except BaseException:
+                self._local.conn = None
+                conn.close()
+                raise
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    # Archivierte Jahre: {Jahr: Pfad der Archivdatei}. Mit after_entry nur
+    # Archive, die Einträge über dieser entry_number enthalten (oder deren
+    # höchste Nummer noch nicht eingetragen ist).
+    def archives(self, after_entry=None):
+        folder = os.path.dirname(os.path.abspath(self.path))
+        if after_entry is None:
+            rows = self.execute("SELECT jahr, datei FROM Archiv ORDER BY jahr")
+        else:
+            rows = self.execute("""
+                SELECT jahr, datei FROM Archiv
+                WHERE letzter_eintrag IS NULL OR letzter_eintrag > ? ORDER BY jahr
+            """, (after_entry,))
+        return {year: os.path.join(folder, name) for year, name in rows}
+
+    def archives_between(self, date_from, date_to, after_entry=None):
+        if date_from is None:
+            return self.archives(after_entry)
+        first = int(str(date_from)[:4])
+        last = (date.fromisoformat(str(date_to)) - timedelta(days=1)).year
+        return {year: path for year, path in self.archives(after_entry).items() if first <= year <= last}
+
+    def attach_limit(self):
+        conn = self.connection()
+        return conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) if hasattr(conn, "getlimit") else 10
+
+    # Schemas mit Daten im halb-offenen Zeitraum [von, bis): immer "main",
+    # dazu die Archive der betroffenen Jahre. Diese werden bei Bedarf
+    # schreibgeschützt angehängt; Archive außerhalb des Zeitraums nicht.
+    # Nur für Zeiträume mit höchstens attach_limit() Archivjahren, sonst
+    # source_groups().
+    def sources(self, date_from, date_to):
+        needed = self.archives_between(date_from, date_to)
+        if len(needed) > self.attach_limit():
+            raise ValueError(f"Der Zeitraum umfasst {len(needed)} Archivjahre – bitte source_groups() verwenden.")
+        return ("main",) + self._attach(needed)
+
+    # Wie sources(), aber für beliebig viele Archivjahre: Gruppen zu höchstens
+    # attach_limit() Archiven, älteste zuerst, "main" mit den neuesten Jahren
+    # in der letzten Gruppe. Eine Gruppe wird erst angehängt, wenn der
+    # Aufrufer zu ihr weiterschaltet – er fragt je Gruppe ab und zählt die
+    # Ergebnisse zusammen. Ohne Zeitraum alle Archive, mit after_entry nur
+    # die mit neueren Einträgen (siehe archives()).
+    def source_groups(self, date_from=None, date_to=None, after_entry=None):
+        needed = self.archives_between(date_from, date_to, after_entry)
+        years = sorted(needed)
+        limit = self.attach_limit()
+        chunks = [years[max(0, end - limit):end] for end in range(len(years), 0, -limit)][::-1] or [[]]
+        for k, chunk in enumerate(chunks):
+            schemas = self._attach({year: needed[year] for year in chunk})
+            yield ("main",) + schemas if k == len(chunks) - 1 else schemas
+
+    # Archive anhängen (bereits angehängte bleiben, andere werden bei Platz-
+    # mangel abgehängt); Ergebnis: Schemanamen in Jahresreihenfolge
+    def _attach(self, needed):
+        if not needed:
+            return ()
+        conn = self.connection()
+        attached = self._local.attached
+        limit = self.attach_limit()
+        for year in [y for y in attached if y not in needed]:
+            if len(attached) + len(set(needed) - set(attached)) <= limit:
+                break
+            conn.execute(f"DETACH DATABASE {attached.pop(year)}")
+        for year, path in needed.items():
+            if year not in attached:
+                if not os.path.exists(path):
+                    raise RuntimeError(f"Archivdatei für {year} fehlt: {path}")
+                conn.execute(f"ATTACH DATABASE ? AS archiv_{year}", (readonly_uri(path),))
+                if conn.execute(f"PRAGMA archiv_{year}.user_version").fetchone()[0] < V3_VERSION:
+                    conn.execute(f"DETACH DATABASE archiv_{year}")
+                    raise RuntimeError(OLD_ARCHIVE_MESSAGE.format(path=path))
+                attached[year] = f"archiv_{year}"
+        return tuple(attached[year] for year in sorted(needed))
+
+    # Zeilenzahl nur bei Schreibzugriffen; bei Abfragen zählt, wer abholt
+    def execute(self, sql, params=()):
+        conn = self.connection()
+        if timings.configured().trace_sql:
+            timings.plan(conn, sql, params)
+        with timings.measure(sql_name(sql)) as record:
+            cursor = conn.execute(sql, params)
+            if cursor.rowcount >= 0:
+                record["rows"] = cursor.rowcount
+        return cursor
+
+    # Schreibtransaktion: Sperre gleich zu Beginn holen, damit zwei Plätze
+    # sich nicht gegenseitig beim Hochstufen einer Lesesperre blockieren.
+    # Gemessen wird inkl. Warten auf die Sperre.
+    @contextmanager
+    def transaction(self, name="Schreibtransaktion"):
+        conn = self.connection()
+        with timings.measure(name):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+# ---------------------------------------------------------------------------
+# DB vorbereiten
+# ---------------------------------------------------------------------------
+# Tagessummen (StatistikTag): Anzahl Einträge, Summe, Minimum und Maximum je
+# Zählspalte und lokalem Tag. "day" ist der SQL-Ausdruck für den Tag einer
+# Zeile ({row} = NEW/OLD/Statistik), "day_rows" die Bedingung, die alle
+# Rohzeilen des Tages StatistikTag.tag auswählt.
+ROLLUP_STATS = tuple(f"{c}_{m}" for c in VALUE_COLUMNS for m in ("min", "max"))
+ROLLUP_DAY = "{row}.datum"
+ROLLUP_DAY_ROWS = "datum = StatistikTag.tag"
+
+
+def rollup_fill_sql(day, where=""):
+    columns = ", ".join(("tag", "anzahl") + VALUE_COLUMNS + ROLLUP_STATS)
+    sums = ", ".join(f"IFNULL(SUM({c}), 0)" for c in VALUE_COLUMNS)
+    extremes = ", ".join(f"{f}(IFNULL({c}, 0))" for c in VALUE_COLUMNS for f in ("MIN", "MAX"))
+    return f"""
+        INSERT INTO StatistikTag ({columns})
+        SELECT {day.format(row="Statistik")}, COUNT(*), {sums}, {extremes}
+        FROM Statistik
+        {where}
+        GROUP BY 1;
+    """
+
+
+ROLLUP_TRIGGERS = ("statistik_tag_insert", "statistik_tag_delete", "statistik_tag_update")
+
+
+# Nur die drei Trigger (z.B. um sie für Massenänderungen kurz zu entfernen)
+def rollup_triggers_sql(day, day_rows):
+    columns = ", ".join(("tag", "anzahl") + VALUE_COLUMNS + ROLLUP_STATS)
+    old_day = day.format(row="OLD")
+
+    def add(row):
+        values = [f"IFNULL({row}.{c}, 0)" for c in VALUE_COLUMNS]
+        values += [f"IFNULL({row}.{c}, 0)" for c in VALUE_COLUMNS for _ in ("min", "max")]
+        updates = ["anzahl = anzahl + 1"]
+        updates += [f"{c} = {c} + excluded.{c}" for c in VALUE_COLUMNS]
+        updates += [f"{c}_min = min({c}_min, excluded.{c}_min), {c}_max = max({c}_max, excluded.{c}_max)"
+                    for c in VALUE_COLUMNS]
+        return f"""
+            INSERT INTO StatistikTag ({columns})
+            VALUES ({day.format(row=row)}, 1, {", ".join(values)})
+            ON CONFLICT (tag) DO UPDATE SET {", ".join(updates)};
+        """
+
+    # Summen lassen sich abziehen, Minimum/Maximum des Tages werden neu gerechnet
+    updates = ["anzahl = anzahl - 1"] + [f"{c} = {c} - IFNULL(OLD.{c}, 0)" for c in VALUE_COLUMNS]
+    remove = f"""
+        UPDATE StatistikTag SET {", ".join(updates)} WHERE tag = {old_day};
+        DELETE FROM StatistikTag WHERE tag = {old_day} AND anzahl <= 0;
+    """
+    extremes = ", ".join(f"{f}(IFNULL({c}, 0))" for c in VALUE_COLUMNS for f in ("MIN", "MAX"))
+    recompute = f"""
+        UPDATE StatistikTag SET ({", ".join(ROLLUP_STATS)}) = (
+            SELECT {extremes} FROM Statistik WHERE {day_rows}
+        ) WHERE tag = {old_day};
+    """
+    return f"""
+        CREATE TRIGGER statistik_tag_insert AFTER INSERT ON Statistik
+        BEGIN {add("NEW")} END;
+
+        CREATE TRIGGER statistik_tag_delete AFTER DELETE ON Statistik
+        BEGIN {remove} {recompute} END;
+
+        CREATE TRIGGER statistik_tag_update AFTER UPDATE ON Statistik
+        BEGIN {remove} {add("NEW")} {recompute} END;
+    """
+
+
+def drop_triggers_sql():
+    return "".join(f"DROP TRIGGER IF EXISTS main.{name};\n" for name in ROLLUP_TRIGGERS)
+
+
+def rollup_sql(day, day_rows):
+    table = ",\n".join(f"{c} INTEGER NOT NULL" for c in ("anzahl",) + VALUE_COLUMNS + ROLLUP_STATS)
+    return f"""
+        {drop_triggers_sql()}
+        DROP TABLE IF EXISTS StatistikTag;
+
+        CREATE TABLE StatistikTag (
+            tag TEXT PRIMARY KEY,
+            {table}
+        ) WITHOUT ROWID;
+
+        {rollup_triggers_sql(day, day_rows)}
+
+        {rollup_fill_sql(day)}
+    """
+
+
+# Schema v3 (Migration 7): STRICT, "today" als Unix-Sekunden (UTC), Zählspalten
+# NOT NULL DEFAULT 0 und ein Index, der Stunden-Auswertungen und das Nachrechnen
+# der Tagessummen ohne Tabellenzugriff bedient. Die Umstellung ist dreigeteilt,
+# damit "statisticus.py upgrade" große Dateien vorab in kleinen Transaktionen
+# kopieren kann (upgrade_file); die Migration kopiert dann nur noch den Rest.
+# Spaltenreihenfolge wie bisher – Archive werden mit SELECT * angehängt.
+V3_VERSION = 7
+V3_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS Statistik_v3 (
+        entry_number INTEGER PRIMARY KEY AUTOINCREMENT,
+        today INTEGER NOT NULL,
+        valueb INTEGER NOT NULL DEFAULT 0,
+        valueks INTEGER NOT NULL DEFAULT 0,
+        valuea INTEGER NOT NULL DEFAULT 0,
+        valuev INTEGER NOT NULL DEFAULT 0,
+        datum TEXT NOT NULL,
+        stunde INTEGER NOT NULL,
+        wochentag INTEGER NOT NULL
+    ) STRICT;
+"""
+V3_COPY_SQL = """
+    INSERT INTO Statistik_v3
+    SELECT entry_number, CAST(strftime('%s', today) AS INTEGER),
+           CAST(IFNULL(valueb, 0) AS INTEGER), CAST(IFNULL(valueks, 0) AS INTEGER),
+           CAST(IFNULL(valuea, 0) AS INTEGER), CAST(IFNULL(valuev, 0) AS INTEGER),
+           datum, stunde, wochentag
+    FROM Statistik
+    WHERE entry_number > (SELECT IFNULL(MAX(entry_number), 0) FROM Statistik_v3)
+    ORDER BY entry_number
+    {limit};
+"""
+# Zähler von AUTOINCREMENT übernehmen, damit gelöschte Nummern nicht wiederkehren
+V3_SWITCH_SQL = """
+    UPDATE sqlite_sequence
+    SET seq = (SELECT MAX(seq) FROM sqlite_sequence WHERE name IN ('Statistik', 'Statistik_v3'))
+    WHERE name = 'Statistik_v3';
+
+    DROP TABLE Statistik;
+    ALTER TABLE Statistik_v3 RENAME TO Statistik;
+
+    CREATE INDEX idx_statistik_datum ON Statistik (datum, stunde, valueb, valueks, valuea, valuev);
+""" + rollup_triggers_sql(ROLLUP_DAY, ROLLUP_DAY_ROWS)
+
+
+# Schema-Migrationen: jede Stufe läuft genau einmal, der erreichte Stand steht
+# in PRAGMA user_version. Neue Stufen immer nur hinten anhängen.
+MIGRATIONS = [
+    # 1: Grundtabelle
+    """
+    CREATE TABLE IF NOT EXISTS Statistik (
+        entry_number INTEGER PRIMARY KEY AUTOINCREMENT,
+        today TEXT,
+        valueb INTEGER,
+        valueks INTEGER,
+        valuea INTEGER,
+        valuev INTEGER
+    );
+    """,
+    # 2: Index für Zeitraum-Abfragen (Jahreszähler, Analyzer, Export)
+    """
+    CREATE INDEX IF NOT EXISTS idx_statistik_today ON Statistik (today);
+    """,
+    # 3: Tagessummen (lokaler Tag), per Trigger mit jeder Eingabe nachgeführt
+    """
+    CREATE TABLE IF NOT EXISTS StatistikTag (
+        tag TEXT PRIMARY KEY,
+        anzahl INTEGER NOT NULL,
+        valueb INTEGER NOT NULL,
+        valueks INTEGER NOT NULL,
+        valuea INTEGER NOT NULL,
+        valuev INTEGER NOT NULL
+    ) WITHOUT ROWID;
+
+    CREATE TRIGGER IF NOT EXISTS statistik_tag_insert AFTER INSERT ON Statistik
+    BEGIN
+        INSERT INTO StatistikTag (tag, anzahl, valueb, valueks, valuea, valuev)
+        VALUES (date(NEW.today, 'localtime'), 1, IFNULL(NEW.valueb, 0), IFNULL(NEW.valueks, 0),
+                IFNULL(NEW.valuea, 0), IFNULL(NEW.valuev, 0))
+        ON CONFLICT (tag) DO UPDATE SET
+            anzahl = anzahl + 1,
+            valueb = valueb + excluded.valueb,
+            valueks = valueks + excluded.valueks,
+            valuea = valuea + excluded.valuea,
+            valuev = valuev + excluded.valuev;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS statistik_tag_delete AFTER DELETE ON Statistik
+    BEGIN
+        UPDATE StatistikTag SET
+            anzahl = anzahl - 1,
+            valueb = valueb - IFNULL(OLD.valueb, 0),
+            valueks = valueks - IFNULL(OLD.valueks, 0),
+            valuea = valuea - IFNULL(OLD.valuea, 0),
+            valuev = valuev - IFNULL(OLD.valuev, 0)
+        WHERE tag = date(OLD.today, 'localtime');
+        DELETE FROM StatistikTag WHERE tag = date(OLD.today, 'localtime') AND anzahl <= 0;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS statistik_tag_update AFTER UPDATE ON Statistik
+    BEGIN
+        UPDATE StatistikTag SET
+            anzahl = anzahl - 1,
+            valueb = valueb - IFNULL(OLD.valueb, 0),
+            valueks = valueks - IFNULL(OLD.valueks, 0),
+            valuea = valuea - IFNULL(OLD.valuea, 0),
+            valuev = valuev - IFNULL(OLD.valuev, 0)
+        WHERE tag = date(OLD.today, 'localtime');
+        DELETE FROM StatistikTag WHERE tag = date(OLD.today, 'localtime') AND anzahl <= 0;
+        INSERT INTO StatistikTag (tag, anzahl, valueb, valueks, valuea, valuev)
+        VALUES (date(NEW.today, 'localtime'), 1, IFNULL(NEW.valueb, 0), IFNULL(NEW.valueks, 0),
+                IFNULL(NEW.valuea, 0), IFNULL(NEW.valuev, 0))
+        ON CONFLICT (tag) DO UPDATE SET
+            anzahl = anzahl + 1,
+            valueb = valueb + excluded.valueb,
+            valueks = valueks + excluded.valueks,
+            valuea = valuea + excluded.valuea,
+            valuev = valuev + excluded.valuev;
+    END;
+
+    DELETE FROM StatistikTag;
+    INSERT INTO StatistikTag (tag, anzahl, valueb, valueks, valuea, valuev)
+    SELECT date(today, 'localtime'), COUNT(*), IFNULL(SUM(valueb), 0), IFNULL(SUM(valueks), 0),
+           IFNULL(SUM(valuea), 0), IFNULL(SUM(valuev), 0)
+    FROM Statistik
+    GROUP BY 1;
+    """,
+    # 4: Tagessummen zusätzlich mit Minimum/Maximum je Eintrag
+    rollup_sql("date({row}.today, 'localtime')",
+               "today >= datetime(StatistikTag.tag, 'utc') AND today < datetime(StatistikTag.tag, '+1 day', 'utc')"),
+    # 5: Lokales Datum, Stunde und Wochentag (1 = Montag) als eigene Spalten,
+    #    einmalig nachgetragen; Trigger vorher weg, sonst feuert jede Zeile
+    """
+    DROP TRIGGER IF EXISTS statistik_tag_insert;
+    DROP TRIGGER IF EXISTS statistik_tag_delete;
+    DROP TRIGGER IF EXISTS statistik_tag_update;
+
+    ALTER TABLE Statistik ADD COLUMN datum TEXT;
+    ALTER TABLE Statistik ADD COLUMN stunde INTEGER;
+    ALTER TABLE Statistik ADD COLUMN wochentag INTEGER;
+
+    UPDATE Statistik SET
+        datum = date(today, 'localtime'),
+        stunde = CAST(strftime('%H', today, 'localtime') AS INTEGER),
+        wochentag = (CAST(strftime('%w', today, 'localtime') AS INTEGER) + 6) % 7 + 1;
+
+    CREATE INDEX IF NOT EXISTS idx_statistik_datum ON Statistik (datum, stunde);
+    """ + rollup_sql("{row}.datum", "datum = StatistikTag.tag"),
+    # 6: Abgeschlossene Jahre in eigenen Archivdateien (siehe archive_year)
+    """
+    CREATE TABLE IF NOT EXISTS Archiv (
+        jahr INTEGER PRIMARY KEY,
+        datei TEXT NOT NULL,
+        anzahl INTEGER NOT NULL
+    );
+    """,
+    # 7: Schema v3 (siehe oben)
+    V3_TABLE_SQL + V3_COPY_SQL.format(limit="") + V3_SWITCH_SQL,
+    # 8: Zuletzt geschriebene Journal-Nummer je Platz (siehe EntryBuffer)
+    """
+    CREATE TABLE IF NOT EXISTS Puffer (
+        platz TEXT PRIMARY KEY,
+        seq INTEGER NOT NULL
+    ) STRICT;
+    """,
+    # 9: Höchste entry_number je Archiv (fortlaufender Export überspringt ältere)
+    """
+    ALTER TABLE Archiv ADD COLUMN letzter_eintrag INTEGER;
+    """,
+    # 10: Wochentag in den abdeckenden Index (Auslastung liest ihn statt ihn zu berechnen)
+    """
+    DROP INDEX IF EXISTS idx_statistik_datum;
+    CREATE INDEX idx_statistik_datum ON Statistik (datum, stunde, wochentag, valueb, valueks, valuea, valuev);
+    """,
+]
+
+
+# SQL-Skript in einzelne Anweisungen zerlegen (Trigger-Rümpfe bleiben ganz)
+def split_sql(script):
+    statement = ""
+    for part in script.split(";"):
+        statement += part + ";"
+        if sqlite3.complete_statement(statement):
+            if statement.strip(" \t\n;"):
+                yield statement
+            statement = ""
+
+
+# Alle ausstehenden Stufen in einer Schreibtransaktion – starten mehrere
+# Plätze gleichzeitig, migriert nur der erste, die anderen sehen den neuen Stand.
+def migrate(database, target=None):
+    target = len(MIGRATIONS) if target is None else target
+    with database.transaction("migrate") as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < V3_VERSION <= target and sqlite3.sqlite_version_info < (3, 37):
+            raise RuntimeError(f"Statisticus braucht SQLite 3.37 oder neuer (vorhanden: {sqlite3.sqlite_version}).")
+        for script in MIGRATIONS[version:target]:
+            for statement in split_sql(script):
+                conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {max(version, target)}")
+
+
+# Tagessummen aus den Rohdaten neu aufbauen (z.B. nach Handkorrekturen),
+# komplett oder nur für die lokalen Tage im halb-offenen Zeitraum
+def rebuild_rollup(date_from=None, date_to=None):
+    with db.transaction("rebuild_rollup") as conn:
+        if date_from is None:
+            conn.execute("DELETE FROM StatistikTag")
+            conn.execute(rollup_fill_sql(ROLLUP_DAY))
+        else:
+            bounds = (str(date_from), str(date_to))
+            conn.execute("DELETE FROM StatistikTag WHERE tag >= ? AND tag < ?", bounds)
+            conn.execute(rollup_fill_sql(ROLLUP_DAY, "WHERE datum >= ? AND datum < ?"), bounds)
+    cache.invalidate()
+
+
+# Gemeinsame Datenbank aller Plätze im aktuellen Ordner
+db = Database(DB_NAME)
+
+# ---------------------------------------------------------------------------
+# Abfrage-Cache
+# ---------------------------------------------------------------------------
+# LRU-Cache für Abfrageergebnisse (Summen, Diagrammreihen). Gültig ist ein
+# Eintrag nur für die Generation, in der er berechnet wurde: eigene Schreib-
+# vorgänge rufen invalidate() auf, Schreibvorgänge anderer Plätze (und anderer
+# Verbindungen dieses Prozesses) zeigt PRAGMA data_version der jeweiligen
+# Verbindung an. Zwischengespeicherte Ergebnisse dürfen nicht verändert werden.
+class QueryCache:
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._bump()
+
+    def get(self, key, compute):
+        generation = self._current_generation()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == generation:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = compute()
+        with self._lock:
+            if generation == self.generation:
+                self._entries[key] = (generation, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _bump(self):
+        self.generation += 1
+        self._entries.clear()
+
+    # Eine Verbindung, die zum ersten Mal fragt, kennt den alten Stand nicht –
+    # auch dann lieber einmal verwerfen
+    def _current_generation(self):
+        conn = db.connection()
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        with self._lock:
+            if self._versions.get(id(conn)) != version:
+                self._versions[id(conn)] = version
+                self._bump()
+            return self.generation
+
+
+cache = QueryCache()
+
+# Andere Datenbankdatei verwenden (z.B. "statisticus.py --db"); geöffnet und
+# migriert wird sie wie DB_NAME erst bei der ersten Abfrage
+def open_database(path):
+    global db
+    db.close()
+    db = Database(path)
+    cache.invalidate()
+    return db
+
+# ---------------------------------------------------------------------------
+# Hilfsfunktionen
+# ---------------------------------------------------------------------------
+# Zeiträume immer halb-offen [von, bis) abbilden, damit SQLite den Index auf
+# "today" bzw. den Primärschlüssel der Tagessummen nutzen kann.
+def year_range(year):
+    return f"{year}-01-01", f"{year + 1}-01-01"
+
+def day_range(date_from, date_to):
+    return str(date_from), str(date_to + timedelta(days=1))
+
+# Lokales Datum, Stunde und Wochentag werden beim Schreiben aus dem
+# Zeitstempel (Unix-Sekunden, today = None → jetzt) abgeleitet. Alle Schreibwege
+# müssen über INSERT_SQL gehen, die Tagessummen-Trigger brauchen "datum".
+INSERT_SQL = """
+    INSERT INTO Statistik (today, datum, stunde, wochentag, valueb, valueks, valuea, valuev)
+    SELECT ts, date(ts, 'unixepoch', 'localtime'), CAST(strftime('%H', ts, 'unixepoch', 'localtime') AS INTEGER),
+           (CAST(strftime('%w', ts, 'unixepoch', 'localtime') AS INTEGER) + 6) % 7 + 1,
+           IFNULL(:valueb, 0), IFNULL(:valueks, 0), IFNULL(:valuea, 0), IFNULL(:valuev, 0)
+    FROM (SELECT IFNULL(:today, CAST(strftime('%s', 'now') AS INTEGER)) AS ts)
+"""
+
+def insert_data(zb=None, zks=None, za=None, zv=None):
+    db.execute(INSERT_SQL, {"today": None, "valueb": zb, "valueks": zks, "valuea": za, "valuev": zv})
+    cache.invalidate()
+
+# ---------------------------------------------------------------------------
+# Eingabepuffer
+# ---------------------------------------------------------------------------
+# Optional ([buffer] enabled = yes): Eingaben gehen sofort in eine Liste im
+# Speicher und in eine lokale Journaldatei (eine Zeile je Eingabe) und werden
+# gesammelt in einer Transaktion geschrieben – vom Aufrufer alle flush_seconds,
+# ab flush_count Eingaben und beim Beenden ausgelöst. Die Tabelle Puffer hält
+# je Platz die zuletzt geschriebene laufende Nummer, in derselben Transaktion
+# wie die Eingaben: das Nachspielen des Journals nach einem Absturz schreibt
+# so keine Eingabe doppelt. Das Journal wird nur geleert, nie fsync't – es
+# übersteht einen Programmabsturz, keinen Stromausfall.
+# Journal und Platz gehören genau einem Prozess: open() sperrt <Journal>.lock
+# exklusiv. Ein zweites Fenster mit demselben Platz (doppelt gestartet,
+# gemeinsames Konto am Terminalserver) bekommt die Sperre nicht und muss
+# ungepuffert schreiben – sonst überschrieben sich die Journale gegenseitig
+# und die Nummern des zweiten fielen unter das Wasserzeichen in Puffer.
+BUFFER_IN_USE_MESSAGE = ("Der Eingabepuffer {path} wird bereits von einem anderen Statisticus-Fenster "
+                         "verwendet.")
+
+# Nicht blockierende exklusive Sperre; None, wenn ein anderer sie hält
+def lock_file(path):
+    file = open(path, "a+b")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        file.close()
+        return None
+    return file
+
+def journal_line(row):
+    return ";".join(str(row[key]) for key in ("seq", "today") + VALUE_COLUMNS) + "\n"
+
+def parse_journal_line(line):
+    parts = line.rstrip("\n").split(";")
+    if not line.endswith("\n") or len(parts) != 2 + len(VALUE_COLUMNS) or not all(p.isdigit() for p in parts):
+        return None
+    return dict(zip(("seq", "today") + VALUE_COLUMNS, map(int, parts)))
+
+def local_epoch(day):
+    return int(datetime.fromisoformat(str(day)).timestamp())
+
+
+class EntryBuffer:
+    def __init__(self, journal_path, platz, flush_count=20, flush_seconds=5):
+        self.journal_path = journal_path
+        self.platz = platz
+        self.flush_count = flush_count
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._seq = 0
+        self._journal = None
+        self._lock_file = None
+
+    # Journal einlesen: noch nicht geschriebene Eingaben bleiben offen, eine
+    # beim Absturz abgeschnittene letzte Zeile fällt weg. Ergebnis: Anzahl offen.
+    # RuntimeError, wenn ein anderer Prozess das Journal verwendet. Scheitert
+    # das Lesen (z.B. Datenbank gesperrt), wird die Sperre wieder freigegeben.
+    def open(self):
+        self._lock_file = lock_file(self.journal_path + ".lock")
+        if self._lock_file is None:
+            raise RuntimeError(BUFFER_IN_USE_MESSAGE.format(path=self.journal_path))
+        try:
+            row = db.execute("SELECT seq FROM Puffer WHERE platz = ?", (self.platz,)).fetchone()
+            written = self._seq = row[0] if row else 0
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, encoding="utf-8") as file:
+                    for line in file:
+                        entry = parse_journal_line(line)
+                        if entry is None:
+                            continue
+                        self._seq = max(self._seq, entry["seq"])
+                        if entry["seq"] > written:
+                            self._pending.append(entry)
+            with self._lock:
+                self._rewrite()
+        except BaseException:
+            self._pending.clear()
+            self._lock_file.close()
+            self._lock_file = None
+            raise
+        return len(self._pending)
+
+    # Ergebnis True, wenn flush_count erreicht ist
+    def add(self, zb=0, zks=0, za=0, zv=0):
+        with self._lock:
+            self._seq += 1
+            entry = {"seq": self._seq, "today": int(time.time()),
+                     "valueb": zb or 0, "valueks": zks or 0, "valuea": za or 0, "valuev": zv or 0}
+            self._journal.write(journal_line(entry))
+            self._journal.flush()
+            self._pending.append(entry)
+            return len(self._pending) >= self.flush_count
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    # Summen der offenen Eingaben im halb-offenen Zeitraum lokaler Tage
+    def delta(self, date_from, date_to):
+        start, end = local_epoch(date_from), local_epoch(date_to)
+        with self._lock:
+            entries = [e for e in self._pending if start <= e["today"] < end]
+        return {c: sum(e[c] for e in entries) for c in VALUE_COLUMNS}
+
+    # Offene Eingaben in einer Transaktion schreiben; Ergebnis: Anzahl.
+    # Während des Schreibens kommen neue Eingaben ohne Warten dazu.
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                entries = list(self._pending)
+            if not entries:
+                return 0
+            with db.transaction("entry buffer flush") as conn:
+                row = conn.execute("SELECT seq FROM Puffer WHERE platz = ?", (self.platz,)).fetchone()
+                written = row[0] if row else 0
+                conn.executemany(INSERT_SQL, [e for e in entries if e["seq"] > written])
+                conn.execute("""
+                    INSERT INTO Puffer (platz, seq) VALUES (?, ?)
+                    ON CONFLICT (platz) DO UPDATE SET seq = max(seq, excluded.seq)
+                """, (self.platz, entries[-1]["seq"]))
+            cache.invalidate()
+            with self._lock:
+                del self._pending[:len(entries)]
+                self._rewrite()
+            return len(entries)
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+    # Journal = offene Eingaben; ersetzt wird über eine Zwischendatei
+    def _rewrite(self):
+        if self._journal is not None:
+            self._journal.close()
+        temp = self.journal_path + ".neu"
+        with open(temp, "w", encoding="utf-8") as file:
+            file.writelines(journal_line(e) for e in self._pending)
+        os.replace(temp, self.journal_path)
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+
+# Eingabepuffer nach statisticus.ini oder None, wenn abgeschaltet
+def entry_buffer_from_settings():
+    config = settings()["buffer"]
+    if not config.getboolean("enabled"):
+        return None
+    host = re.sub(r"\W+", "_", platform.node() or "platz")
+    user = re.sub(r"\W+", "_", os.environ.get("USERNAME") or os.environ.get("USER") or "")
+    journal = config["journal"] or os.path.join(os.path.dirname(os.path.abspath(db.path)),
+                                                 f"statisticus_{host}_{user}.journal")
+    return EntryBuffer(journal, f"{host}/{user}", config.getint("flush_count"), config.getfloat("flush_seconds"))
+
+# Gruppierungen für aggregate(): Tag/Woche/Monat aus den Tagessummen,
+# Stunde des Tages bzw. einzelne Stunden ("YYYY-MM-DD HH") aus den Rohdaten.
+# Woche = Montag der ISO-Woche.
+GROUPINGS = {
+    None: "NULL",
+    "day": "tag",
+    "week": "date(tag, 'weekday 0', '-6 days')",
+    "month": "substr(tag, 1, 7)",
+}
+RAW_GROUPINGS = {
+    "hour": "stunde",
+    "day_hour": "datum || printf(' %02d', stunde)",
+}
+
+# SUM, COUNT, MIN, MAX und AVG für beliebige Zählspalten in einem Durchlauf.
+# Zeitraum halb-offen in lokalen Tagen (siehe year_range/day_range).
+# Ergebnis: {Gruppe: {Spalte: {"sum", "count", "min", "max", "avg"}}},
+# ohne Gruppierung ist die einzige Gruppe None.
+def aggregate(columns, date_from, date_to, group_by=None):
+    columns = tuple(columns)
+    date_from, date_to = str(date_from), str(date_to)
+    return cache.get(("aggregate", columns, date_from, date_to, group_by),
+                     lambda: query_aggregate(columns, date_from, date_to, group_by))
+
+# Mehr Archivjahre als gleichzeitig angehängt werden können: eine Abfrage je
+# Gruppe (Database.source_groups), die Teilergebnisse wie Standorte zusammenzählen
+def query_aggregate(columns, date_from, date_to, group_by):
+    with timings.measure(f"aggregate {group_by or 'gesamt'}") as record:
+        parts = [aggregate_result(db.execute(aggregate_sql(columns, group_by, schemas),
+                                             (date_from, date_to)).fetchall(), columns, group_by)
+                 for schemas in db.source_groups(date_from, date_to)]
+        result = parts[0] if len(parts) == 1 else merge_aggregates(parts)
+        record["rows"] = len(result)
+    return result
+
+def aggregate_result(rows, columns, group_by):
+    result = {}
+    for gruppe, count, *values in rows:
+        count = count or 0
+        if group_by == "week":
+            year, week, _ = date.fromisoformat(gruppe).isocalendar()
+            gruppe = f"{year}-W{week:02d}"
+        result[gruppe] = {
+            c: {
+                "sum": int(values[3 * i] or 0),
+                "count": count,
+                "min": values[3 * i + 1],
+                "max": values[3 * i + 2],
+                "avg": (values[3 * i] or 0) / count if count else 0.0,
+            }
+            for i, c in enumerate(columns)
+        }
+    return result
+
+# Tabelle aus Hauptdatei und angehängten Archiven (siehe Database.sources).
+# Die WHERE-Bedingung der äußeren Abfrage schiebt SQLite in jeden Zweig, so
+# bleibt der Index je Datei nutzbar.
+def source_sql(table, schemas):
+    if schemas == ("main",):
+        return table
+    union = " UNION ALL ".join(f"SELECT * FROM {schema}.{table}" for schema in schemas)
+    return f"({union}) AS {table}"
+
+# Gleiche Anfrage → gleicher SQL-Text, damit der Statement-Cache greift
+@lru_cache(maxsize=None)
+def aggregate_sql(columns, group_by, schemas=("main",)):
+    check_columns(columns)
+
+    if group_by in GROUPINGS:
+        select = ", ".join(f"SUM({c}), MIN({c}_min), MAX({c}_max)" for c in columns)
+        sql = f"""
+            SELECT {GROUPINGS[group_by]} AS gruppe, SUM(anzahl), {select}
+            FROM {source_sql("StatistikTag", schemas)}
+            WHERE tag >= ? AND tag < ?
+        """
+    elif group_by in RAW_GROUPINGS:
+        select = ", ".join(f"SUM({c}), MIN({c}), MAX({c})" for c in columns)
+        sql = f"""
+            SELECT {RAW_GROUPINGS[group_by]} AS gruppe, COUNT(*), {select}
+            FROM {source_sql("Statistik", schemas)}
+            WHERE datum >= ? AND datum < ?
+        """
+    else:
+        raise ValueError(f"Unbekannte Gruppierung: {group_by}")
+    if group_by is not None:
+        sql += " GROUP BY gruppe ORDER BY gruppe"
+    return sql
+
+def get_year_totals():
+    totals = aggregate(VALUE_COLUMNS, *year_range(datetime.now().year))[None]
+    return {c: totals[c]["sum"] for c in VALUE_COLUMNS}
+
+
+# ---------------------------------------------------------------------------
+# Jahreszähler mit Änderungserkennung
+# ---------------------------------------------------------------------------
+# changed() fragt nur PRAGMA data_version der Verbindung des aufrufenden
+# Threads ab – das ändert sich, sobald eine andere Verbindung (anderer Platz,
+# Worker-Thread) etwas geschrieben hat, und kostet keinen Dateizugriff.
+# refresh() liest die Jahressummen einmal aus den Tagessummen und addiert
+# danach nur Einträge über dem Wasserzeichen (entry_number) – ein Sprung über
+# den Primärschlüssel. Neu gelesen wird beim Jahreswechsel und alle
+# resync_minutes, damit auch Löschungen und Korrekturen ankommen.
+class CounterWatcher:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._loaded = 0.0
+        self.year = None
+        self.totals = None
+        self.watermark = 0
+
+    def changed(self):
+        version = db.connection().execute("PRAGMA data_version").fetchone()[0]
+        changed = version != self._version
+        self._version = version
+        return changed
+
+    # Ergebnis: {Spalte: Summe im laufenden Jahr}
+    def refresh(self):
+        resync = settings()["counters"].getfloat("resync_minutes") * 60
+        with self._lock:
+            year = datetime.now().year
+            if self.totals is None or year != self.year or time.monotonic() - self._loaded >= resync:
+                self._load(year)
+            else:
+                self._apply_new_entries()
+            return dict(self.totals)
+
+    # Summen und Wasserzeichen aus demselben Stand
+    def _load(self, year):
+        with timings.measure("counters load"):
+            conn = db.connection()
+            conn.execute("BEGIN")
+            try:
+                watermark = conn.execute("SELECT IFNULL(MAX(entry_number), 0) FROM Statistik").fetchone()[0]
+                row = conn.execute(aggregate_sql(VALUE_COLUMNS, None), year_range(year)).fetchone()
+            finally:
+                conn.execute("COMMIT")
+        self.totals = {c: int(row[2 + 3 * i] or 0) for i, c in enumerate(VALUE_COLUMNS)}
+        self.year, self.watermark, self._loaded = year, watermark, time.monotonic()
+
+    # Das Wasserzeichen rückt auch über neue Einträge anderer Jahre (Import) hinweg
+    def _apply_new_entries(self):
+        sums = ", ".join(f"SUM(CASE WHEN datum >= :von AND datum < :bis THEN {c} ELSE 0 END)"
+                         for c in VALUE_COLUMNS)
+        von, bis = year_range(self.year)
+        with timings.measure("counters delta"):
+            last, *values = db.execute(f"SELECT MAX(entry_number), {sums} FROM Statistik WHERE entry_number > :seit",
+                                       {"von": von, "bis": bis, "seit": self.watermark}).fetchone()
+        if last is not None:
+            self.totals = {c: self.totals[c] + int(v or 0) for c, v in zip(VALUE_COLUMNS, values)}
+            self.watermark = last
+
+
+# ---------------------------------------------------------------------------
+# Standorte (Zweigstellen)
+# ---------------------------------------------------------------------------
+# Jede Zweigstelle hat ihre eigene Datenbankdatei; statisticus.ini nennt sie
+# im Abschnitt [locations] (Name = Pfad). Summen über alle Standorte laufen
+# parallel in einem Prozess-Pool: jeder Prozess öffnet eine Datei (und ihre
+# Archive) nur lesend und rechnet mit query_aggregate wie für die eigene
+# Datei, zusammengeführt wird im aufrufenden Prozess. Prozesse statt Threads,
+# weil das Auswerten der Zeilen in Python den GIL hält.
+TOTAL_LOCATION = "Gesamt"
+
+# Eigener Parser, damit die Namen ihre Groß-/Kleinschreibung behalten
+def locations(path=None):
+    config = configparser.ConfigParser(interpolation=None)
+    config.optionxform = str
+    config.read(path or config_path(), encoding="utf-8")
+    return dict(config.items("locations")) if config.has_section("locations") else {}
+
+# Läuft im Pool-Prozess: dort ist db die Datei des Standorts
+def location_aggregate(path, columns, date_from, date_to, group_by):
+    global db
+    db = Database(path, readonly=True)
+    try:
+        return query_aggregate(columns, date_from, date_to, group_by)
+    finally:
+        db.close()
+
+def merge_extreme(function, a, b):
+    values = [v for v in (a, b) if v is not None]
+    return function(values) if values else None
+
+def merge_aggregates(results):
+    merged = {}
+    for result in results:
+        for gruppe, values in result.items():
+            target = merged.setdefault(gruppe, {})
+            for column, stats in values.items():
+                if column not in target:
+                    target[column] = dict(stats)
+                    continue
+                total = target[column]
+                total["sum"] += stats["sum"]
+                total["count"] += stats["count"]
+                total["min"] = merge_extreme(min, total["min"], stats["min"])
+                total["max"] = merge_extreme(max, total["max"], stats["max"])
+                total["avg"] = total["sum"] / total["count"] if total["count"] else 0.0
+    return dict(sorted(merged.items(), key=lambda item: (item[0] is not None, item[0])))
+
+# Wie aggregate(), je Standort und zusammen: {Standort: Ergebnis, ..., "Gesamt": Ergebnis}.
+# processes: Größe des Pools (Standard: Zahl der Standorte, höchstens CPU-Kerne).
+def aggregate_locations(columns, date_from, date_to, group_by=None, names=None, processes=None):
+    from concurrent.futures import ProcessPoolExecutor
+
+    places = locations()
+    if not places:
+        raise ValueError("In statisticus.ini sind unter [locations] keine Standorte eingetragen.")
+    unknown = set(names or ()) - set(places)
+    if unknown:
+        raise ValueError(f"Unbekannte Standorte: {', '.join(sorted(unknown))}")
+    places = {name: path for name, path in places.items() if not names or name in names}
+    columns, date_from, date_to = tuple(columns), str(date_from), str(date_to)
+    aggregate_sql(columns, group_by)  # Spalten und Gruppierung vor dem Start der Prozesse prüfen
+
+    with timings.measure(f"aggregate standorte {group_by or 'gesamt'}") as record:
+        workers = processes or min(len(places), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers, initializer=pool_process_setup) as pool:
+            futures = {name: pool.submit(location_aggregate, path, columns, date_from, date_to, group_by)
+                       for name, path in places.items()}
+            result = {}
+            for name, future in futures.items():
+                try:
+                    result[name] = future.result()
+                except (sqlite3.Error, RuntimeError) as exc:
+                    raise RuntimeError(f"Standort {name}: {exc}") from exc
+        result[TOTAL_LOCATION] = merge_aggregates(result.values())
+        record["rows"] = len(places)
+    return result
+
+# Summen je Standort als Tabelle (Standort, Gruppe, Einträge, Summen), Gesamt zuletzt
+def export_locations(path, fmt, columns, date_from, date_to, group_by=None, names=None):
+    columns = tuple(columns)
+    result = aggregate_locations(columns, date_from, date_to, group_by, names)
+    span = f"{date_from} bis {date.fromisoformat(str(date_to)) - timedelta(days=1)}"
+    with timings.measure(f"export standorte {fmt}") as record:
+        rows = [[name, gruppe or span, values[columns[0]]["count"]] +
+                [values[c]["sum"] for c in columns]
+                for name, groups in result.items() for gruppe, values in groups.items()]
+        write_report(path, fmt, ["Standort", "Gruppe", "Einträge"] + [COLUMN_LABELS[c] for c in columns], rows)
+        record["rows"] = len(rows)
+    return len(rows)
+
+
+# ---------------------------------------------------------------------------
+# Summen-Schnappschuss für den Analyzer
+# ---------------------------------------------------------------------------
+# Die Tagessummen aller Jahre (Hauptdatei und Archive) einmal je Sitzung als
+# numpy-Arrays laden: Tage aufsteigend und kumulierte Summen je Zählspalte
+# mit führender Nullzeile. Die Summe über [von, bis) sind dann zwei
+# searchsorted und eine Subtraktion, ohne SQLite und ohne angehängte Archive.
+# Von/Bis sind im Analyzer ganze Tage, feiner als Tagessummen muss der
+# Schnappschuss daher nicht sein (wenige tausend Zeilen statt aller Einträge).
+# refresh() holt nur Einträge über dem Wasserzeichen (entry_number) nach.
+class TotalsSnapshot:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.days = None
+        self.sums = None
+        self.watermark = 0
+
+    def loaded(self):
+        return self.days is not None
+
+    def load(self):
+        import numpy as np
+
+        with timings.measure("snapshot load") as record:
+            parts = []
+            for year in db.archives():
+                schema = db.sources(*year_range(year))[-1]
+                parts += db.execute(f"SELECT tag, {', '.join(VALUE_COLUMNS)} FROM {schema}.StatistikTag").fetchall()
+            # Wasserzeichen und Tagessummen der Hauptdatei aus demselben Stand
+            conn = db.connection()
+            conn.execute("BEGIN")
+            try:
+                watermark = conn.execute("SELECT IFNULL(MAX(entry_number), 0) FROM Statistik").fetchone()[0]
+                parts += conn.execute(f"SELECT tag, {', '.join(VALUE_COLUMNS)} FROM StatistikTag").fetchall()
+            finally:
+                conn.execute("COMMIT")
+            record["rows"] = len(parts)
+
+            # Ein Tag kann in Archiv und Hauptdatei stehen (Nachimport)
+            tags = np.array([row[0] for row in parts], dtype="datetime64[D]").astype(np.int64)
+            values = np.array([row[1:] for row in parts], dtype=np.int64).reshape(-1, len(VALUE_COLUMNS))
+            days, index = np.unique(tags, return_inverse=True)
+            per_day = np.zeros((len(days), len(VALUE_COLUMNS)), dtype=np.int64)
+            np.add.at(per_day, index, values)
+            sums = np.zeros((len(days) + 1, len(VALUE_COLUMNS)), dtype=np.int64)
+            np.cumsum(per_day, axis=0, out=sums[1:])
+            with self._lock:
+                self.days, self.sums, self.watermark = days, sums, watermark
+
+    # Neue Einträge (auch von anderen Plätzen und Nachimporte in alte Tage)
+    # einsortieren; ein Eintrag in einen frühen Tag verschiebt alle späteren
+    # Summen – bei wenigen tausend Tagen eine einzige Vektoroperation.
+    def refresh(self):
+        import numpy as np
+
+        with self._lock:
+            with timings.measure("snapshot refresh") as record:
+                rows = db.execute(f"""
+                    SELECT datum, MAX(entry_number), {", ".join(f"SUM({c})" for c in VALUE_COLUMNS)}
+                    FROM Statistik WHERE entry_number > ? GROUP BY datum
+                """, (self.watermark,)).fetchall()
+                record["rows"] = len(rows)
+                for tag, last, *values in rows:
+                    day = np.datetime64(tag, "D").astype(np.int64)
+                    position = np.searchsorted(self.days, day)
+                    if position == len(self.days) or self.days[position] != day:
+                        self.days = np.insert(self.days, position, day)
+                        self.sums = np.insert(self.sums, position + 1, self.sums[position], axis=0)
+                    self.sums[position + 1:] += np.array(values, dtype=np.int64)
+                    self.watermark = max(self.watermark, last)
+
+    # Summen je Spalte im halb-offenen Zeitraum lokaler Tage: {Spalte: Summe}
+    def totals(self, columns, date_from, date_to):
+        import numpy as np
+
+        with self._lock:
+            start, end = np.searchsorted(self.days, [date.fromisoformat(str(d)).toordinal()
+                                                     - EPOCH_ORDINAL for d in (date_from, date_to)])
+            difference = self.sums[end] - self.sums[start]
+        return {c: int(difference[VALUE_COLUMNS.index(c)]) for c in columns}
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Schnappschuss nach statisticus.ini oder None (abgeschaltet oder kein numpy)
+def snapshot_from_settings():
+    if not settings()["analyzer"].getboolean("snapshot"):
+        return None
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return TotalsSnapshot()
+
+
+# ---------------------------------------------------------------------------
+# Diagramm
+# ---------------------------------------------------------------------------
+# Die Werte werden in SQL zu Zeitabschnitten summiert; die Abschnittsgröße
+# richtet sich nach der Länge des Zeitraums, sodass höchstens einige hundert
+# Punkte gezeichnet werden – unabhängig von der Zahl der Rohzeilen.
+PLOT_COLORS = {"valueb": "blue", "valuea": "red", "valueks": "orange", "valuev": "green"}
+BUCKET_LABELS = {"day_hour": "pro Stunde", "day": "pro Tag", "week": "pro Woche", "month": "pro Monat"}
+
+def plot_bucket(date_from, date_to):
+    days = (date.fromisoformat(str(date_to)) - date.fromisoformat(str(date_from))).days
+    if days <= 14:
+        return "day_hour"
+    if days <= 400:
+        return "day"
+    if days <= 5 * 366:
+        return "week"
+    return "month"
+
+def bucket_start(bucket, key):
+    if bucket == "day_hour":
+        return datetime.strptime(key, "%Y-%m-%d %H")
+    if bucket == "week":
+        year, week = key.split("-W")
+        monday = date.fromisocalendar(int(year), int(week), 1)
+        return datetime(monday.year, monday.month, monday.day)
+    if bucket == "month":
+        return datetime.strptime(key, "%Y-%m")
+    return datetime.strptime(key, "%Y-%m-%d")
+
+def next_bucket(bucket, moment):
+    if bucket == "day_hour":
+        return moment + timedelta(hours=1)
+    if bucket == "day":
+        return moment + timedelta(days=1)
+    if bucket == "week":
+        return moment + timedelta(weeks=1)
+    return (moment.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+# Summen je Abschnitt im halb-offenen Zeitraum, leere Abschnitte als 0.
+# Ergebnis: (Abschnittsgröße, [Abschnittsbeginn], {Spalte: [Summe]}),
+# ohne Einträge im Zeitraum ist die Liste der Abschnitte leer.
+def plot_series(columns, date_from, date_to):
+    columns = tuple(columns)
+    date_from, date_to = str(date_from), str(date_to)
+    with timings.measure("plot_series") as record:
+        result = cache.get(("plot_series", columns, date_from, date_to),
+                           lambda: query_plot_series(columns, date_from, date_to))
+        record["rows"] = len(result[1])
+    return result
+
+def query_plot_series(columns, date_from, date_to):
+    bucket = plot_bucket(date_from, date_to)
+    data = aggregate(columns, date_from, date_to, group_by=bucket)
+    if not data:
+        return bucket, [], {c: [] for c in columns}
+    sums = {bucket_start(bucket, key): values for key, values in data.items()}
+
+    moment = datetime.strptime(str(date_from), "%Y-%m-%d")
+    if bucket == "week":
+        moment -= timedelta(days=moment.weekday())
+    elif bucket == "month":
+        moment = moment.replace(day=1)
+    end = datetime.strptime(str(date_to), "%Y-%m-%d")
+
+    x = []
+    while moment < end:
+        x.append(moment)
+        moment = next_bucket(bucket, moment)
+    series = {c: [sums[m][c]["sum"] if m in sums else 0 for m in x] for c in columns}
+    return bucket, x, series
+
+# Alle Reihen in eine Achse; ax wird geleert und kann wiederverwendet werden
+def draw_series(ax, bucket, x, series, title):
+    ax.clear()
+    for column, values in series.items():
+        ax.plot(x, values, color=PLOT_COLORS[column], label=COLUMN_LABELS[column])
+    ax.set_title(f"{title} ({BUCKET_LABELS[bucket]})")
+    ax.set_ylim(bottom=0)
+    ax.grid(alpha=0.3)
+    ax.legend()
+    ax.figure.autofmt_xdate()
+
+
+# ---------------------------------------------------------------------------
+# Auslastung nach Wochentag und Stunde
+# ---------------------------------------------------------------------------
+# Eine Abfrage: je Datei erst nach (datum, stunde) summieren – das läuft in
+# der Reihenfolge des abdeckenden Index idx_statistik_datum, ohne Tabellen-
+# zugriff und ohne Sortieren –, danach die wenigen Tag-Stunde-Gruppen nach
+# dem gespeicherten Wochentag (im Index enthalten, je Tag gleich).
+WEEKDAY_LABELS = ("Mo", "Di", "Mi", "Do", "Fr", "Sa", "So")
+MONTH_LABELS = ("Januar", "Februar", "März", "April", "Mai", "Juni", "Juli",
+                "August", "September", "Oktober", "November", "Dezember")
+
+@lru_cache(maxsize=None)
+def heatmap_sql(columns, by_month, schemas=("main",)):
+    check_columns(columns)
+    sums = ", ".join(f"SUM({c}) AS {c}" for c in columns)
+    branches = " UNION ALL ".join(f"""
+        SELECT datum, stunde, wochentag, {sums} FROM {schema}.Statistik
+        WHERE datum >= :von AND datum < :bis GROUP BY datum, stunde""" for schema in schemas)
+    month = "CAST(substr(datum, 6, 2) AS INTEGER)" if by_month else "NULL"
+    return f"""
+        SELECT {month} AS monat, wochentag, stunde, {", ".join(f"SUM({c})" for c in columns)}
+        FROM ({branches})
+        GROUP BY monat, wochentag, stunde
+    """
+
+# Summen je Wochentag und Stunde im halb-offenen Zeitraum.
+# Ergebnis: {Monat 1–12 bzw. None: {Spalte: 7×24 Summen, Montag zuerst}};
+# ohne by_month ist die einzige Gruppe None, ohne Einträge ist es leer.
+def heatmap(columns, date_from, date_to, by_month=False):
+    columns = tuple(columns)
+    date_from, date_to = str(date_from), str(date_to)
+    return cache.get(("heatmap", columns, date_from, date_to, by_month),
+                     lambda: query_heatmap(columns, date_from, date_to, by_month))
+
+def query_heatmap(columns, date_from, date_to, by_month):
+    with timings.measure("heatmap") as record:
+        rows = [row for schemas in db.source_groups(date_from, date_to)
+                for row in db.execute(heatmap_sql(columns, by_month, schemas),
+                                      {"von": date_from, "bis": date_to}).fetchall()]
+        record["rows"] = len(rows)
+
+    result = {}
+    for monat, wochentag, stunde, *values in rows:
+        grid = result.setdefault(monat, {c: [[0] * 24 for _ in WEEKDAY_LABELS] for c in columns})
+        for column, value in zip(columns, values):
+            grid[column][wochentag - 1][stunde] += int(value or 0)
+    # Einträge nur mit Nullen in den gewählten Spalten zählen wie keine
+    return dict(sorted(((monat, grids) for monat, grids in result.items() if active_hours(grids)),
+                       key=lambda item: item[0] or 0))
+
+# Stunden mit Einträgen (z.B. Öffnungszeiten), damit das Bild nicht
+# überwiegend aus leeren Nachtstunden besteht
+def active_hours(grids):
+    hours = [h for h in range(24) if any(row[h] for grid in grids.values() for row in grid)]
+    return list(range(hours[0], hours[-1] + 1)) if hours else []
+
+# Ein Bild je Spalte untereinander; figure wird geleert und kann wiederverwendet werden.
+# Ergebnis False (nichts gezeichnet), wenn alle Werte 0 sind.
+def draw_heatmap(figure, grids, title):
+    figure.clear()
+    hours = active_hours(grids)
+    if not hours:
+        return False
+    axes = figure.subplots(len(grids), 1, sharex=True, squeeze=False)[:, 0]
+    for ax, (column, grid) in zip(axes, grids.items()):
+        # Feste Skala ab 0, auch wenn eine Spalte nur Nullen hat
+        image = ax.imshow([[row[h] for h in hours] for row in grid], aspect="auto", cmap="YlOrRd",
+                          vmin=0, vmax=max(1, max(max(row) for row in grid)))
+        ax.set_yticks(range(len(WEEKDAY_LABELS)), WEEKDAY_LABELS)
+        ax.set_xticks(range(len(hours)), [str(h) for h in hours])
+        ax.set_title(COLUMN_LABELS[column], fontsize=10)
+        figure.colorbar(image, ax=ax)
+    axes[-1].set_xlabel("Stunde")
+    figure.suptitle(title)
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Vergleich mit Vorjahren
+# ---------------------------------------------------------------------------
+# Der Zeitraum und derselbe Zeitraum in den Vorjahren in einer Abfrage über
+# die Tagessummen: die Zeiträume stehen als VALUES-Tabelle im SQL und werden
+# mit StatistikTag verbunden. Ein 29. Februar wird im Vorjahr zum 28.
+def shift_years(day, years):
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+@lru_cache(maxsize=None)
+def compare_sql(columns, periods, schemas=("main",)):
+    check_columns(columns)
+    values = ", ".join("(?, ?, ?)" for _ in range(periods))
+    return f"""
+        WITH zeitraum (nr, von, bis) AS (VALUES {values})
+        SELECT zeitraum.nr, SUM(anzahl), {", ".join(f"SUM({c})" for c in columns)}
+        FROM zeitraum JOIN {source_sql("StatistikTag", schemas)}
+             ON StatistikTag.tag >= zeitraum.von AND StatistikTag.tag < zeitraum.bis
+        GROUP BY zeitraum.nr
+    """
+
+# Tage first..last (inklusive) und dieselben Tage in den years Vorjahren.
+# Ergebnis: Liste vom aktuellen zum ältesten Zeitraum mit "label", "first",
+# "last", "count" und je Spalte "sums", "delta" und "percent" gegenüber dem
+# jeweils vorherigen Jahr (None beim ältesten und wenn das Vorjahr keine
+# Einträge hat; "percent" auch bei Vorjahreswert 0).
+def compare_periods(columns, first, last, years):
+    columns = tuple(columns)
+    first, last = date.fromisoformat(str(first)), date.fromisoformat(str(last))
+    if last < first:
+        raise ValueError("Das Ende des Zeitraums liegt vor dem Anfang.")
+    if years < 1:
+        raise ValueError("Mindestens ein Vorjahr angeben.")
+    return cache.get(("compare", columns, first, last, years),
+                     lambda: query_compare(columns, first, last, years))
+
+def query_compare(columns, first, last, years):
+    spans = [(shift_years(first, k), shift_years(last, k)) for k in range(years + 1)]
+    params = [value for k, (a, b) in enumerate(spans) for value in (k, *day_range(a, b))]
+    with timings.measure("compare") as record:
+        rows = {}
+        for schemas in db.source_groups(*day_range(spans[-1][0], spans[0][1])):
+            for nr, *values in db.execute(compare_sql(columns, len(spans), schemas), params).fetchall():
+                rows[nr] = [(a or 0) + (b or 0) for a, b in zip(rows.get(nr, [0] * len(values)), values)]
+        record["rows"] = len(rows)
+
+    periods = []
+    for k, (a, b) in enumerate(spans):
+        count, *sums = rows.get(k, [0] * (len(columns) + 1))
+        periods.append({"label": str(a.year) if first.year == last.year else f"{a} bis {b}",
+                        "first": a, "last": b, "count": count or 0,
+                        "sums": {c: int(v or 0) for c, v in zip(columns, sums)}})
+    for period, previous in zip(periods, periods[1:] + [None]):
+        period["delta"], period["percent"] = {}, {}
+        for c in columns:
+            before = previous["sums"][c] if previous and previous["count"] else None
+            period["delta"][c] = None if before is None else period["sums"][c] - before
+            period["percent"][c] = (round(100 * (period["sums"][c] - before) / before, 1)
+                                    if before else None)
+    return periods
+
+# Balken je Spalte, nebeneinander je Zeitraum (ältester links)
+def draw_comparison(ax, periods, title):
+    ax.clear()
+    columns = list(periods[0]["sums"])
+    width = 0.8 / len(periods)
+    for i, period in enumerate(reversed(periods)):
+        ax.bar([x + i * width for x in range(len(columns))], [period["sums"][c] for c in columns],
+               width, label=period["label"])
+    ax.set_xticks([x + width * (len(periods) - 1) / 2 for x in range(len(columns))],
+                  [COLUMN_LABELS[c] for c in columns])
+    ax.set_title(title)
+    ax.grid(axis="y", alpha=0.3)
+    ax.legend()
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+# Rohdaten werden blockweise gelesen und sofort geschrieben – der Speicherbedarf
+# hängt von EXPORT_CHUNKSIZE ab, nicht von der Länge des Zeitraums.
+EXPORT_CHUNKSIZE = 10_000
+
+# Mit since nur Einträge über einer entry_number, in deren Reihenfolge
+# (fortlaufender Export); der Zeitraum ist dann optional
+@lru_cache(maxsize=None)
+def export_sql(columns, schemas=("main",), dated=True, since=False):
+    check_columns(columns)
+    where = ["entry_number > :seit"] if since else []
+    where += ["datum >= :von AND datum < :bis"] if dated else []
+    return f"""
+        SELECT entry_number, {", ".join(columns)}, datum, time(today, 'unixepoch', 'localtime')
+        FROM {source_sql("Statistik", schemas)}
+        WHERE {" AND ".join(where)}
+        ORDER BY {"entry_number" if since else "datum, today, entry_number"}
+    """
+
+def export_header(columns):
+    return ["entry_number"] + [COLUMN_LABELS[c] for c in columns] + ["Datum", "Uhrzeit"]
+
+# Bei mehr Archivjahren als gleichzeitig angehängt werden können, ist die
+# Reihenfolge je Gruppe sortiert (Archive nach Jahren, zuletzt die Hauptdatei)
+def iter_export_rows(columns, date_from, date_to, chunksize=EXPORT_CHUNKSIZE, after_entry=None):
+    dated, since = date_from is not None, after_entry is not None
+    params = {"von": str(date_from), "bis": str(date_to), "seit": after_entry}
+    for schemas in db.source_groups(date_from, date_to, after_entry):
+        cur = db.execute(export_sql(tuple(columns), schemas, dated, since), params)
+        try:
+            while True:
+                rows = cur.fetchmany(chunksize)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cur.close()
+
+
+class CsvWriter:
+    # Semikolon + BOM, damit Excel mit deutschen Ländereinstellungen die Datei direkt öffnet
+    def __init__(self, path, header):
+        self.file = open(path, "w", newline="", encoding="utf-8-sig")
+        self.writer = csv.writer(self.file, delimiter=";")
+        self.writer.writerow(header)
+
+    # An eine bestehende Datei anhängen (ohne Kopfzeile und BOM)
+    @classmethod
+    def append(cls, path):
+        self = cls.__new__(cls)
+        self.file = open(path, "a", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file, delimiter=";")
+        return self
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class XlsxWriter:
+    # write-only: openpyxl hält keine Zellen im Speicher; volle Blätter
+    # (Excel-Grenze 1.048.576 Zeilen) werden auf ein neues Blatt fortgesetzt
+    MAX_ROWS = 1_048_575
+
+    def __init__(self, path, header):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise RuntimeError("Für den Excel-Export wird das Paket 'openpyxl' benötigt.")
+        self.path = path
+        self.header = header
+        self.workbook = Workbook(write_only=True)
+        self.sheets = 0
+        self._new_sheet()
+
+    def _new_sheet(self):
+        self.sheets += 1
+        self.sheet = self.workbook.create_sheet("Statistik" if self.sheets == 1 else f"Statistik {self.sheets}")
+        self.sheet.append(self.header)
+        self.rows = 0
+
+    def write(self, rows):
+        for row in rows:
+            if self.rows == self.MAX_ROWS:
+                self._new_sheet()
+            self.sheet.append(row)
+            self.rows += 1
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+class ParquetWriter:
+    def __init__(self, path, header):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Für den Parquet-Export wird das Paket 'pyarrow' benötigt.")
+        self.pa = pa
+        self.schema = pa.schema([(name, pa.int64()) for name in header[:-2]] +
+                                [(name, pa.string()) for name in header[-2:]])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        self.writer.write_table(self.pa.Table.from_arrays(
+            [self.pa.array(values, type=field.type) for values, field in zip(columns, self.schema)],
+            schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+EXPORT_FORMATS = {
+    "xlsx": ("Excel (.xlsx)", XlsxWriter),
+    "csv": ("CSV (.csv)", CsvWriter),
+    "parquet": ("Parquet (.parquet)", ParquetWriter),
+}
+
+# Schreibt den Zeitraum blockweise nach path; liefert die Zeilenzahl.
+# Ohne Daten wird keine Datei angelegt. job (optional) für Abbruch/Fortschritt.
+def export_data(path, fmt, columns, date_from, date_to, job=None):
+    columns = tuple(columns)
+    writer = None
+    count = 0
+    with timings.measure(f"export {fmt}") as record:
+        try:
+            for rows in iter_export_rows(columns, date_from, date_to):
+                if writer is None:
+                    writer = EXPORT_FORMATS[fmt][1](path, export_header(columns))
+                writer.write(rows)
+                count += len(rows)
+                if job:
+                    job.check()
+                    job.progress(f"{count} Zeilen exportiert …")
+        finally:
+            if writer is not None:
+                writer.close()
+            record["rows"] = count
+    return count
+
+# ---------------------------------------------------------------------------
+# Fortlaufender Export (nur neue Einträge)
+# ---------------------------------------------------------------------------
+# Ein Ziel merkt sich in <Ziel>.manifest.json die höchste exportierte
+# entry_number; jeder weitere Lauf liest nur Einträge darüber – ein Sprung
+# über den Primärschlüssel, die Dauer hängt von der Zahl neuer Einträge ab.
+# Da nur ein Platz zur Zeit schreibt, bekommt ein später festgeschriebener
+# Eintrag nie eine kleinere Nummer als ein bereits sichtbarer. Archive, deren
+# höchste Nummer (Archiv.letzter_eintrag) am Wasserzeichen liegt, bleiben zu.
+# CSV wird angehängt; Excel und Parquet bekommen je Lauf eine Teildatei
+# (<Ziel>_0001.xlsx, …), die zusammen den Datenbestand bilden. Das Manifest
+# wird erst nach den Daten ersetzt: ein abgebrochener Lauf wird beim nächsten
+# wiederholt, die CSV-Datei vorher auf die zuletzt festgehaltene Länge gekürzt.
+# Archive von vor Migration 9 kennen ihre höchste entry_number noch nicht;
+# einmal nachtragen, danach hängt der Export nur Archive mit neueren an
+def record_archive_entries():
+    folder = os.path.dirname(os.path.abspath(db.path))
+    for year, name in db.execute("SELECT jahr, datei FROM Archiv WHERE letzter_eintrag IS NULL").fetchall():
+        path = os.path.join(folder, name)
+        if not os.path.exists(path):
+            raise RuntimeError(f"Archivdatei für {year} fehlt: {path}")
+        conn = sqlite3.connect(readonly_uri(path), uri=True)
+        try:
+            newest = conn.execute("SELECT IFNULL(MAX(entry_number), 0) FROM Statistik").fetchone()[0]
+        finally:
+            conn.close()
+        db.execute("UPDATE Archiv SET letzter_eintrag = ? WHERE jahr = ?", (newest, year))
+
+def manifest_path(path):
+    return path + ".manifest.json"
+
+def part_path(path, number):
+    root, ext = os.path.splitext(path)
+    return f"{root}_{number:04d}{ext}"
+
+def read_manifest(path):
+    try:
+        with open(manifest_path(path), encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+def write_manifest(path, manifest):
+    temp = manifest_path(path) + ".neu"
+    with open(temp, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2, ensure_ascii=False)
+    os.replace(temp, manifest_path(path))
+
+# Neue Einträge seit dem letzten Lauf an path anhängen bzw. als nächste
+# Teildatei schreiben. Zeitraum (halb-offen) und Spalten werden beim ersten
+# Lauf festgelegt. Ergebnis: {"rows", "file", "last_entry"}; ohne neue
+# Einträge ist "file" None.
+def export_incremental(path, fmt, columns, date_from=None, date_to=None, job=None):
+    columns = tuple(columns)
+    span = [str(date_from), str(date_to)] if date_from is not None else None
+    manifest = read_manifest(path) or {"format": fmt, "columns": list(columns), "range": span,
+                                      "last_entry": 0, "csv_bytes": 0, "parts": [], "runs": []}
+    if (manifest["format"], manifest["columns"], manifest["range"]) != (fmt, list(columns), span):
+        raise ValueError(f"Das Ziel {path} wurde mit {manifest['format']}, den Spalten "
+                         f"{', '.join(manifest['columns'])} und dem Zeitraum {manifest['range'] or 'alles'} "
+                         f"angelegt – bitte ein anderes Ziel wählen.")
+
+    record_archive_entries()
+
+    if fmt == "csv":
+        target = path
+        if manifest["csv_bytes"]:
+            with open(path, "r+b") as file:
+                file.truncate(manifest["csv_bytes"])
+    else:
+        target = part_path(path, len(manifest["parts"]) + 1)
+
+    count = 0
+    last = manifest["last_entry"]
+    writer = None
+    with timings.measure(f"export fortlaufend {fmt}") as record:
+        try:
+            for rows in iter_export_rows(columns, date_from, date_to, after_entry=manifest["last_entry"]):
+                if writer is None:
+                    if fmt == "csv" and manifest["csv_bytes"]:
+                        writer = CsvWriter.append(target)
+                    else:
+                        writer = EXPORT_FORMATS[fmt][1](target, export_header(columns))
+                writer.write(rows)
+                count += len(rows)
+                last = max(last, rows[-1][0])
+                if job:
+                    job.check()
+                    job.progress(f"{count} neue Zeilen exportiert …")
+        finally:
+            if writer is not None:
+                writer.close()
+            record["rows"] = count
+
+    if not count:
+        return {"rows": 0, "file": None, "last_entry": last}
+    if fmt == "csv":
+        manifest["csv_bytes"] = os.path.getsize(target)
+    else:
+        manifest["parts"].append(os.path.basename(target))
+    manifest["runs"].append({"at": datetime.now().isoformat(timespec="seconds"), "rows": count,
+                             "first_entry": manifest["last_entry"] + 1, "last_entry": last,
+                             "file": os.path.basename(target)})
+    manifest["last_entry"] = last
+    write_manifest(path, manifest)
+    return {"rows": count, "file": target, "last_entry": last}
+
+
+# Auswertungen (Auslastung, Vergleich) als Tabelle, nur CSV und Excel
+REPORT_FORMATS = ("xlsx", "csv")
+
+def write_report(path, fmt, header, rows):
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"Auswertungen können nur als {' oder '.join(REPORT_FORMATS)} exportiert werden.")
+    writer = EXPORT_FORMATS[fmt][1](path, header)
+    try:
+        writer.write(rows)
+    finally:
+        writer.close()
+
+# Auslastung als Liste (Monat, Wochentag, Stunde, Summen); liefert die
+# Zeilenzahl, ohne Daten wird keine Datei angelegt.
+def export_heatmap(path, fmt, columns, date_from, date_to, by_month=False):
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"Auswertungen können nur als {' oder '.join(REPORT_FORMATS)} exportiert werden.")
+    columns = tuple(columns)
+    with timings.measure(f"export heatmap {fmt}") as record:
+        rows = [([MONTH_LABELS[monat - 1]] if by_month else []) + [WEEKDAY_LABELS[day], hour] +
+                [grids[c][day][hour] for c in columns]
+                for monat, grids in heatmap(columns, date_from, date_to, by_month).items()
+                for day in range(len(WEEKDAY_LABELS)) for hour in range(24)
+                if any(grids[c][day][hour] for c in columns)]
+        record["rows"] = len(rows)
+        if rows:
+            write_report(path, fmt, (["Monat"] if by_month else []) + ["Wochentag", "Stunde"] +
+                         [COLUMN_LABELS[c] for c in columns], rows)
+    return len(rows)
+
+# Vergleich als Tabelle: je Zeitraum Summe, Differenz und Prozent je Spalte
+def export_comparison(path, fmt, columns, date_from, date_to, years):
+    columns = tuple(columns)
+    with timings.measure(f"export vergleich {fmt}") as record:
+        periods = compare_periods(columns, date_from, date_to, years)
+        header = ["Zeitraum", "Einträge"] + [f"{COLUMN_LABELS[c]} {part}" for c in columns
+                                             for part in ("", "Δ", "Δ %")]
+        rows = [[p["label"], p["count"]] + [value for c in columns for value in
+                                           (p["sums"][c], p["delta"][c], p["percent"][c])]
+                for p in periods]
+        write_report(path, fmt, [name.strip() for name in header], rows)
+        record["rows"] = len(rows)
+    return len(rows)
+
+# ---------------------------------------------------------------------------
+# Berichte je Zeitraum (z.B. alle Monate eines Jahres)
+# ---------------------------------------------------------------------------
+# Die Tagessummen aller Zeiträume kommen aus einer Abfrage über den ganzen
+# Bereich; gezeichnet und geschrieben wird parallel in einem Prozess-Pool
+# (matplotlib mit Agg ohne pyplot, openpyxl) – das Rendern braucht den
+# Großteil der Zeit und hält in einem Prozess den GIL.
+REPORT_OUTPUTS = ("pdf", "png", "xlsx")
+
+# Zeiträume (Bezeichnung, erster Tag, letzter Tag) der Monate eines Jahres
+def month_periods(year):
+    return [(f"{year}-{month:02d}", date(year, month, 1),
+             date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)) for month in range(1, 13)]
+
+def report_data(columns, periods):
+    columns = tuple(columns)
+    first = min(p[1] for p in periods)
+    last = max(p[2] for p in periods)
+    with timings.measure("report data") as record:
+        days = aggregate(columns, *day_range(first, last), group_by="day")
+        record["rows"] = len(days)
+
+    result = []
+    for label, start, end in periods:
+        x = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        result.append({
+            "label": label, "first": start, "last": end, "days": x,
+            "count": [days[str(d)][columns[0]]["count"] if str(d) in days else 0 for d in x],
+            "series": {c: [days[str(d)][c]["sum"] if str(d) in days else 0 for d in x] for c in columns},
+        })
+    return result
+
+# Je Spalte: Summe, Tage mit Einträgen, Schnitt je solchem Tag, stärkster Tag
+def report_summary(period):
+    header = ["Wert", "Summe", "Tage mit Einträgen", "Ø je Tag", "Stärkster Tag", "am"]
+    active = sum(1 for count in period["count"] if count)
+    rows = []
+    for column, values in period["series"].items():
+        peak = max(range(len(values)), key=values.__getitem__) if values else None
+        rows.append([COLUMN_LABELS[column], sum(values), active, round(sum(values) / active, 1) if active else 0,
+                     values[peak] if values else 0, str(period["days"][peak]) if values else ""])
+    return header, rows
+
+# Läuft im Pool-Prozess; Ergebnis: geschriebene Dateien
+def render_report(folder, period, outputs):
+    paths = []
+    base = os.path.join(folder, f"statisticus_{period['label']}")
+    header, rows = report_summary(period)
+    title = f"{period['first']} bis {period['last']}"
+
+    if "pdf" in outputs or "png" in outputs:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        figure = Figure(figsize=(11.69, 8.27), dpi=100)
+        FigureCanvasAgg(figure)
+        grid = figure.add_gridspec(2, 1, height_ratios=(1, 3))
+        table_ax = figure.add_subplot(grid[0])
+        table_ax.axis("off")
+        table_ax.table(cellText=rows, colLabels=header, loc="center")
+        x = [datetime(d.year, d.month, d.day) for d in period["days"]]
+        draw_series(figure.add_subplot(grid[1]), "day", x, period["series"], title)
+        for output in ("pdf", "png"):
+            if output in outputs:
+                figure.savefig(f"{base}.{output}")
+                paths.append(f"{base}.{output}")
+
+    if "xlsx" in outputs:
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise RuntimeError("Für den Excel-Bericht wird das Paket 'openpyxl' benötigt.")
+        workbook = Workbook(write_only=True)
+        summary = workbook.create_sheet("Summen")
+        summary.append([title])
+        summary.append(header)
+        for row in rows:
+            summary.append(row)
+        sheet = workbook.create_sheet("Tage")
+        sheet.append(["Datum", "Einträge"] + [COLUMN_LABELS[c] for c in period["series"]])
+        for i, day in enumerate(period["days"]):
+            sheet.append([day, period["count"][i]] + [values[i] for values in period["series"].values()])
+        workbook.save(f"{base}.xlsx")
+        paths.append(f"{base}.xlsx")
+    return paths
+
+# Je Zeitraum eine PDF/PNG-Seite (Summentabelle + Verlauf) und eine Excel-Datei
+# (Blätter "Summen" und "Tage") in folder. Ergebnis: Liste der Dateien.
+def batch_report(folder, periods, outputs=("pdf", "xlsx"), columns=VALUE_COLUMNS, processes=None, job=None):
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    unknown = set(outputs) - set(REPORT_OUTPUTS)
+    if unknown:
+        raise ValueError(f"Unbekannte Berichtsformate: {', '.join(sorted(unknown))}")
+    os.makedirs(folder, exist_ok=True)
+    data = report_data(columns, periods)
+    paths = []
+    with timings.measure("report", rows=len(data)):
+        with ProcessPoolExecutor(max_workers=processes or min(len(data), os.cpu_count() or 1),
+                                 initializer=pool_process_setup) as pool:
+            futures = [pool.submit(render_report, folder, period, tuple(outputs)) for period in data]
+            for done, future in enumerate(as_completed(futures), 1):
+                paths += future.result()
+                if job:
+                    job.check()
+                    job.progress(f"{done} von {len(futures)} Berichten fertig …")
+    return sorted(paths)
+
+# ---------------------------------------------------------------------------
+# Import historischer Zählungen
+# ---------------------------------------------------------------------------
+# CSV (Trennzeichen wird erkannt) oder XLSX mit Kopfzeile. Zeitpunkt entweder
+# in "Zeitpunkt" oder in "Datum" (+ optional "Uhrzeit"), lokale Zeit; Werte in
+# den Spalten BenutzerIn, Kopie/Scan, Anfrage, BesucherIn (fehlend = 0).
+# Exportdateien lassen sich damit unverändert wieder einlesen.
+IMPORT_BATCH = 5_000
+IMPORT_DATE_FORMATS = ("%d.%m.%Y %H:%M:%S", "%d.%m.%Y %H:%M", "%d.%m.%Y")
+
+def cell_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+def read_import_rows(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as file:
+            # Eine einzelne Spalte oder nur die Kopfzeile erkennt der Sniffer
+            # nicht – dann gilt das Semikolon wie beim Export
+            try:
+                dialect = csv.Sniffer().sniff(file.read(4096), delimiters=";,\t")
+            except csv.Error:
+                dialect = None
+            file.seek(0)
+            reader = csv.reader(file, dialect) if dialect else csv.reader(file, delimiter=";")
+            try:
+                header = [cell_text(name) for name in next(reader, [])]
+                for number, row in enumerate(reader, start=2):
+                    if any(cell.strip() for cell in row):
+                        yield number, dict(zip(header, row))
+            except csv.Error as exc:
+                raise ValueError(f"CSV-Datei nicht lesbar (Zeile {reader.line_num}): {exc}")
+    elif extension in (".xlsx", ".xlsm"):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise RuntimeError("Für den Excel-Import wird das Paket 'openpyxl' benötigt.")
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [cell_text(name) for name in next(rows, ())]
+            for number, row in enumerate(rows, start=2):
+                if any(cell_text(cell) for cell in row):
+                    yield number, dict(zip(header, row))
+        finally:
+            workbook.close()
+    else:
+        raise ValueError("Importiert werden können nur CSV- oder Excel-Dateien (.csv, .xlsx).")
+
+# Lokaler Zeitpunkt der Zeile → Unix-Sekunden
+def parse_import_timestamp(record):
+    value = record.get("Zeitpunkt") or record.get("Datum")
+    if isinstance(value, datetime):
+        moment = value
+    elif isinstance(value, date):
+        moment = datetime(value.year, value.month, value.day)
+    else:
+        # ISO (JJJJ-MM-TT [hh:mm[:ss]]) direkt, deutsches Format als Rückfall
+        text = cell_text(value)
+        try:
+            moment = datetime.fromisoformat(text)
+        except ValueError:
+            for fmt in IMPORT_DATE_FORMATS:
+                try:
+                    moment = datetime.strptime(text, fmt)
+                    break
+                except ValueError:
+                    pass
+            else:
+                raise ValueError(f"Ungültiges Datum: '{text}'")
+
+    text = cell_text(record.get("Uhrzeit"))
+    if text:
+        parts = text.split(":")
+        if not 2 <= len(parts) <= 3 or not all(part.isdigit() for part in parts):
+            raise ValueError(f"Ungültige Uhrzeit: '{text}'")
+        hour, minute, second = (int(part) for part in parts + ["0"] * (3 - len(parts)))
+        try:
+            moment = moment.replace(hour=hour, minute=minute, second=second)
+        except ValueError:
+            raise ValueError(f"Ungültige Uhrzeit: '{text}'")
+
+    return int(moment.timestamp())
+
+def parse_import_row(record):
+    row = {"today": parse_import_timestamp(record)}
+    for column, label in COLUMN_LABELS.items():
+        row[column] = to_int_strict(cell_text(record.get(label)), label)
+    return row
+
+# Import in Transaktionen zu IMPORT_BATCH Zeilen. Abgelehnte Zeilen landen mit
+# Grund in "<Datei>_abgelehnt.csv". Danach werden die Tagessummen der
+# betroffenen Tage neu aufgebaut und die Planer-Statistik (ANALYZE) erneuert.
+def import_file(path, job=None):
+    started = time.perf_counter()
+    imported = 0
+    rejected = []
+    batch = []
+    first = last = None
+
+    def flush():
+        with db.transaction("import batch") as conn:
+            conn.executemany(INSERT_SQL, batch)
+
+    try:
+        for number, record in read_import_rows(path):
+            try:
+                row = parse_import_row(record)
+            except ValueError as exc:
+                rejected.append((number, str(exc).replace("\n", " "), record))
+                continue
+            batch.append(row)
+            first = row["today"] if first is None else min(first, row["today"])
+            last = row["today"] if last is None else max(last, row["today"])
+
+            if len(batch) >= IMPORT_BATCH:
+                flush()
+                imported += len(batch)
+                batch = []
+                if job:
+                    job.check()
+                    job.progress(f"{imported} Zeilen importiert …")
+        if batch:
+            flush()
+            imported += len(batch)
+    finally:
+        cache.invalidate()
+
+    if imported:
+        # UTC-Tage ± 1 decken alle betroffenen lokalen Tage ab
+        rebuild_rollup(datetime.fromtimestamp(first, timezone.utc).date() - timedelta(days=1),
+                       datetime.fromtimestamp(last, timezone.utc).date() + timedelta(days=2))
+        db.execute("ANALYZE main")
+
+    rejects_path = None
+    if rejected:
+        rejects_path = os.path.splitext(path)[0] + "_abgelehnt.csv"
+        with open(rejects_path, "w", newline="", encoding="utf-8-sig") as file:
+            writer = csv.writer(file, delimiter=";")
+            writer.writerow(["Zeile", "Grund", "Inhalt"])
+            for number, reason, record in rejected:
+                writer.writerow([number, reason, "; ".join(cell_text(v) for v in record.values())])
+
+    seconds = time.perf_counter() - started
+    timings.add({"name": "import_file", "rows": imported, "at": time.time() - seconds, "ms": seconds * 1000})
+    return {
+        "imported": imported,
+        "rejected": len(rejected),
+        "rejects_path": rejects_path,
+        "seconds": seconds,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Archiv
+# ---------------------------------------------------------------------------
+# Abgeschlossene Jahre wandern in eigene Dateien neben der Hauptdatei
+# ("statisticus_2023.db"). Auswertung und Export hängen sie bei Bedarf an
+# (Database.sources), Eingabe und Jahreszähler arbeiten nur mit der kleinen
+# Hauptdatei. Ablauf je Jahr:
+#   1. Zeilen in die Archivdatei kopieren, dort die Tagessummen aufbauen
+#   2. in einer Transaktion der Hauptdatei das Jahr in "Archiv" eintragen und
+#      die kopierten Zeilen löschen (Trigger dafür kurz entfernt)
+# Bricht der Ablauf nach 1. ab, ist das Archiv nicht eingetragen und wird beim
+# nächsten Lauf neu geschrieben. Später importierte Zeilen eines bereits
+# archivierten Jahres werden beim nächsten Lauf angehängt.
+def archive_file_name(year):
+    return f"{os.path.splitext(os.path.basename(db.path))[0]}_{year}.db"
+
+def archive_year(year):
+    if year >= date.today().year:
+        raise ValueError(f"Das Jahr {year} ist noch nicht abgeschlossen.")
+    bounds = year_range(year)
+    registered = db.archives()
+    path = registered.get(year) or os.path.join(os.path.dirname(os.path.abspath(db.path)),
+                                                archive_file_name(year))
+    if year not in registered:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    # Nur bis hierher kopieren und löschen – gleichzeitig importierte Zeilen
+    # bleiben für den nächsten Lauf in der Hauptdatei
+    last_entry = db.execute("SELECT MAX(entry_number) FROM Statistik WHERE datum >= ? AND datum < ?",
+                            bounds).fetchone()[0]
+    if last_entry is None:
+        return 0
+    selection = "datum >= ? AND datum < ? AND entry_number <= ?"
+    params = bounds + (last_entry,)
+
+    # Archivdatei ohne WAL (eine einzelne Datei) und ohne Trigger – sie wird
+    # nur noch gelesen. Tabellen und Indizes 1:1 aus der Hauptdatei.
+    conn = sqlite3.connect(path, timeout=db.timeout, isolation_level=None, uri=True)
+    try:
+        conn.execute("ATTACH DATABASE ? AS live", (readonly_uri(db.path),))
+        with timings.measure("archive_year copy") as record:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if year in registered:
+                    if conn.execute("PRAGMA main.user_version").fetchone()[0] < V3_VERSION:
+                        raise RuntimeError(OLD_ARCHIVE_MESSAGE.format(path=path))
+                else:
+                    for (sql,) in conn.execute("""
+                        SELECT sql FROM live.sqlite_master
+                        WHERE type IN ('table', 'index') AND sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+                    """).fetchall():
+                        conn.execute(sql)
+                    conn.execute(f"PRAGMA main.user_version = {len(MIGRATIONS)}")
+                conn.execute(f"INSERT OR IGNORE INTO main.Statistik SELECT * FROM live.Statistik WHERE {selection}",
+                             params)
+                conn.execute("DELETE FROM main.StatistikTag")
+                conn.execute(rollup_fill_sql(ROLLUP_DAY))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            copied, newest = conn.execute("SELECT COUNT(*), MAX(entry_number) FROM main.Statistik").fetchone()
+            record["rows"] = copied
+        conn.execute("DETACH DATABASE live")
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+    with db.transaction("archive_year") as conn:
+        conn.execute("""
+            INSERT INTO Archiv (jahr, datei, anzahl, letzter_eintrag) VALUES (?, ?, ?, ?)
+            ON CONFLICT (jahr) DO UPDATE SET anzahl = excluded.anzahl, letzter_eintrag = excluded.letzter_eintrag
+        """, (year, os.path.basename(path), copied, newest))
+        for statement in split_sql(drop_triggers_sql()):
+            conn.execute(statement)
+        moved = conn.execute(f"DELETE FROM Statistik WHERE {selection}", params).rowcount
+        conn.execute("DELETE FROM StatistikTag WHERE tag >= ? AND tag < ?", bounds)
+        for statement in split_sql(rollup_triggers_sql(ROLLUP_DAY, ROLLUP_DAY_ROWS)):
+            conn.execute(statement)
+        conn.execute(rollup_fill_sql(ROLLUP_DAY, "WHERE datum >= ? AND datum < ?"), bounds)
+    cache.invalidate()
+    return moved
+
+# Alle Jahre mit Daten in der Hauptdatei bis einschließlich "through"
+# (Standard: Vorjahr) archivieren; Ergebnis: {Jahr: verschobene Zeilen}
+def archive_years(through=None, job=None):
+    through = date.today().year - 1 if through is None else through
+    years = [year for (year,) in db.execute(
+        "SELECT DISTINCT CAST(substr(tag, 1, 4) AS INTEGER) FROM StatistikTag WHERE tag < ?",
+        (f"{through + 1}-01-01",))]
+    moved = {}
+    for year in years:
+        if job:
+            job.check()
+            job.progress(f"Jahr {year} wird archiviert …")
+        moved[year] = archive_year(year)
+    return moved
+
+
+# ---------------------------------------------------------------------------
+# Umstellung auf Schema v3
+# ---------------------------------------------------------------------------
+# Große Dateien vorab in Blöcken kopieren: jeder Block ist eine eigene kurze
+# Transaktion, die Eingabe an anderen Plätzen läuft weiter. Nach einem Abbruch
+# setzt der nächste Lauf beim höchsten kopierten entry_number fort. Zum
+# Schluss kopiert migrate() den Rest und schaltet um. Archive werden genauso
+# umgestellt und bleiben ohne Trigger und ohne WAL.
+UPGRADE_BATCH = 50_000
+
+def upgrade_file(path, batch=UPGRADE_BATCH, archive=False, job=None):
+    database = Database(path, auto_migrate=False)
+    try:
+        if database.execute("PRAGMA user_version").fetchone()[0] >= V3_VERSION:
+            return 0
+        migrate(database, V3_VERSION - 1)
+        with database.transaction("upgrade v3") as conn:
+            conn.execute(V3_TABLE_SQL)
+
+        copied = 0
+        while True:
+            with database.transaction("upgrade v3") as conn:
+                rows = conn.execute(V3_COPY_SQL.format(limit=f"LIMIT {int(batch)}")).rowcount
+            copied += rows
+            if job:
+                job.check()
+                job.progress(f"{os.path.basename(path)}: {copied} Zeilen umgestellt …")
+            if rows < batch:
+                break
+
+        migrate(database)
+        if archive:
+            with database.transaction("upgrade v3") as conn:
+                for statement in split_sql(drop_triggers_sql()):
+                    conn.execute(statement)
+            database.execute("PRAGMA journal_mode = DELETE")
+            database.execute("VACUUM")
+        database.execute("ANALYZE main")
+        return copied
+    finally:
+        database.close()
+
+# Hauptdatei und alle Archive; Ergebnis: {Datei: umgestellte Zeilen}
+def upgrade(batch=UPGRADE_BATCH, job=None):
+    result = {db.path: upgrade_file(db.path, batch, job=job)}
+    for path in db.archives().values():
+        result[path] = upgrade_file(path, batch, archive=True, job=job)
+    cache.invalidate()
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Wartung: Sicherung, Statistiken, freie Seiten
+# ---------------------------------------------------------------------------
+# Nichts davon darf insert_data() warten lassen:
+# - Die Sicherung nutzt die Online-Backup-API in kleinen Schritten mit Pause.
+#   Die Quellverbindung hält dabei eine Lesetransaktion offen – mit WAL blockiert
+#   das keine Schreiber, hält aber den Stand fest. Ohne sie finge die Sicherung
+#   nach jeder Eingabe eines anderen Platzes von vorn an. Mit journal_mode =
+#   delete würde dieselbe Lesesperre alle Schreiber bis zum Ende warten lassen,
+#   dort wird deshalb in einem Zug ohne Pausen kopiert.
+# - PRAGMA optimize/ANALYZE mit analysis_limit: nur eine Stichprobe je Index,
+#   die Schreibsperre dauert Millisekunden.
+# - incremental_vacuum gibt freie Seiten in kleinen Schritten frei, jeder in
+#   einer eigenen kurzen Transaktion (nur mit auto_vacuum = INCREMENTAL, siehe
+#   enable_incremental_vacuum).
+BACKUP_PATTERN = re.compile(r"_(\d{8}_\d{6})\.db$")
+
+def backup_folder():
+    folder = settings()["maintenance"]["backup_dir"]
+    return os.path.join(os.path.dirname(os.path.abspath(db.path)), folder)
+
+# Sicherungen der Datenbank im Ordner, älteste zuerst
+def backup_files(folder=None):
+    folder = folder or backup_folder()
+    stem = os.path.splitext(os.path.basename(db.path))[0]
+    if not os.path.isdir(folder):
+        return []
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder)
+                  if name.startswith(stem + "_") and BACKUP_PATTERN.search(name))
+
+def backup_due():
+    files = backup_files()
+    if not files:
+        return True
+    taken = datetime.strptime(BACKUP_PATTERN.search(files[-1]).group(1), "%Y%m%d_%H%M%S")
+    return datetime.now() - taken >= timedelta(hours=settings()["maintenance"].getfloat("backup_hours"))
+
+# Stimmiger Stand der Datenbank als eigenständige Datei (ohne WAL) in folder;
+# danach bleiben die keep neuesten Sicherungen. Ergebnis: Pfad der Sicherung.
+def backup(folder=None, keep=None, job=None):
+    config = settings()["maintenance"]
+    folder = folder or backup_folder()
+    keep = config.getint("keep") if keep is None else keep
+    pages, pause = config.getint("step_pages"), config.getint("step_pause_ms") / 1000
+    os.makedirs(folder, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(db.path))[0]
+    path = os.path.join(folder, f"{stem}_{datetime.now():%Y%m%d_%H%M%S}.db")
+    temp = path + ".tmp"
+
+    def step(status, remaining, total):
+        record["rows"] = total
+        if job:
+            job.check()
+            job.progress(f"Sicherung: {total - remaining} von {total} Seiten …")
+        time.sleep(pause)
+
+    db.connection()  # Schema auf aktuellem Stand, bevor gesichert wird
+    if db.execute("PRAGMA journal_mode").fetchone()[0] != "wal":
+        pages = -1
+    with timings.measure("backup") as record:
+        source = sqlite3.connect(db.path, timeout=db.timeout, isolation_level=None)
+        target = sqlite3.connect(temp, isolation_level=None)
+        try:
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            source.backup(target, pages=pages, progress=step)
+            source.execute("COMMIT")
+            target.execute("PRAGMA journal_mode = DELETE")
+            check = target.execute("PRAGMA quick_check").fetchone()[0]
+            if check != "ok":
+                raise RuntimeError(f"Sicherung fehlerhaft: {check}")
+        except BaseException:
+            target.close()
+            os.remove(temp)
+            raise
+        finally:
+            source.close()
+        target.close()
+        os.replace(temp, path)
+
+    for old in backup_files(folder)[:-keep or None] if keep > 0 else []:
+        os.remove(old)
+    return path
+
+# Statistiken für den Query Planner auffrischen (empfohlen vor dem Schließen)
+def optimize():
+    with timings.measure("optimize"):
+        conn = db.connection()
+        conn.execute("PRAGMA analysis_limit = 1000")
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone() is None:
+            conn.execute("ANALYZE main")
+        conn.execute("PRAGMA optimize")
+
+# Freie Seiten in Schritten an das Dateisystem zurückgeben; Ergebnis: Anzahl
+def release_free_pages(job=None):
+    config = settings()["maintenance"]
+    pages, pause = config.getint("step_pages"), config.getint("step_pause_ms") / 1000
+    conn = db.connection()
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return 0
+    released = 0
+    with timings.measure("incremental_vacuum") as record:
+        while True:
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not free:
+                break
+            # execute() gäbe nur eine Seite je Aufruf frei, executescript() alle
+            conn.executescript(f"PRAGMA incremental_vacuum({pages});")
+            released += min(free, pages)
+            record["rows"] = released
+            if job:
+                job.check()
+            time.sleep(pause)
+    return released
+
+# Einmalig und ohne laufende Eingabe: schreibt die ganze Datei neu (VACUUM)
+def enable_incremental_vacuum():
+    conn = db.connection()
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    with timings.measure("VACUUM"):
+        conn.execute("VACUUM")
+
+# Sicherung (wenn fällig oder force), Statistiken, freie Seiten.
+# Ergebnis: {"backup": Pfad oder None, "released": freigegebene Seiten}
+def maintain(force=False, job=None):
+    path = backup(job=job) if force or backup_due() else None
+    optimize()
+    return {"backup": path, "released": release_free_pages(job)}
+
+
+# Gleiche Regeln für die Eingabemaske und den Import
+def to_int_strict(value, field_name):
+    value = value.strip()
+
+    # Leeres Feld → 0 speichern
+    if value == "":
+        return 0
+
+    # Prüfen, ob nur Ziffern eingegeben wurden (keine Kommas, keine Punkte)
+    if not value.isdigit():
+        raise ValueError(f"Ungültige Eingabe im Feld '{field_name}'.\nBitte nur ganze Zahlen eingeben.")
+
+    return int(value)
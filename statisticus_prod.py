@@ -5,56 +5,31 @@
 
 
 
+import time
+STARTUP = time.perf_counter()
+
+# matplotlib und tkcalendar werden erst bei der ersten Verwendung im
+# Analyzer geladen – das Eingabefenster braucht sie nicht.
 from tkinter import *
-from tkinter import ttk, messagebox
-from tkcalendar import DateEntry
+from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
-import sqlite3
-import pandas as pd
-import matplotlib.pyplot as plt
+import argparse
 import os
+import sys
+import queue
+import sqlite3
+import threading
 
-DB_NAME = "statisticus.db"
+from statisticus_core import (db, COLUMN_LABELS, EXPORT_FORMATS, MONTH_LABELS, CounterWatcher, aggregate,
+                              aggregate_locations, backup_due, compare_periods, day_range, draw_comparison,
+                              draw_heatmap, draw_series, entry_buffer_from_settings, export_comparison,
+                              export_data, export_heatmap, export_incremental, export_locations, heatmap,
+                              import_file, insert_data, locations, maintain, optimize, plot_series, settings,
+                              snapshot_from_settings, timings, to_int_strict, year_range)
 
-# ---------------------------------------------------------------------------
-# DB vorbereiten
-# ---------------------------------------------------------------------------
-with sqlite3.connect(DB_NAME) as conn:
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS Statistik (
-            entry_number INTEGER PRIMARY KEY AUTOINCREMENT,
-            today TEXT,
-            valueb INTEGER,
-            valueks INTEGER,
-            valuea INTEGER,
-            valuev INTEGER
-        )
-    """)
+# Zielwert für "python statisticus_prod.py --startup-time"
+STARTUP_TARGET_MS = 500
 
-# ---------------------------------------------------------------------------
-# Hilfsfunktionen
-# ---------------------------------------------------------------------------
-def insert_data(zb=None, zks=None, za=None, zv=None):
-    with sqlite3.connect(DB_NAME) as conn:
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO Statistik (today, valueb, valueks, valuea, valuev)
-            VALUES (CURRENT_TIMESTAMP, ?, ?, ?, ?)
-        """, (zb, zks, za, zv))
-        conn.commit()
-
-def get_total_year(column):
-    year = datetime.now().year
-    with sqlite3.connect(DB_NAME) as conn:
-        cur = conn.cursor()
-        cur.execute(f"""
-            SELECT TOTAL({column})
-            FROM Statistik
-            WHERE strftime('%Y', today) = ?
-        """, (str(year),))
-        result = cur.fetchone()[0]
-        return int(result or 0)
 
 def validate_int(value):
     if value == "":
@@ -65,43 +40,279 @@ def validate_int(value):
         messagebox.showerror("Fehler", "Bitte eine ganze Zahl eingeben.")
         return None
 
+# Zähler im Hintergrund nachführen (nur neue Einträge, siehe CounterWatcher);
+# überholte Antworten werden verworfen. Mit Eingabepuffer zeigen die Zähler
+# Datenbank + noch offene Eingaben.
+counters_requested = 0
+counters_db = None
+counter_watcher = CounterWatcher()
+
 def update_counters():
-    labelzaehlerb.config(text=str(get_total_year("valueb")))
-    labelzaehlerks.config(text=str(get_total_year("valueks")))
-    labelzaehlera.config(text=str(get_total_year("valuea")))
-    labelzaehlerv.config(text=str(get_total_year("valuev")))
+    global counters_requested
+    counters_requested += 1
+    request = counters_requested
+
+    def done(totals):
+        global counters_db
+        if request != counters_requested:
+            return
+        counters_db = totals
+        show_counters()
+
+    worker.submit(lambda job: counter_watcher.refresh(), on_done=done)
+
+# Einträge anderer Plätze: alle poll_seconds prüfen, gelesen wird nur nach
+# einer Änderung (eigene Eingaben im Tk-Thread melden sich selbst).
+# data_version ist je Verbindung, daher im Tk-Thread; es braucht keine Sperre.
+# Ein Fehler (Datei kurz gesperrt, Netzlaufwerk weg) landet im Zeitprotokoll,
+# der nächste Blick folgt trotzdem.
+def watch_counters():
+    try:
+        if counter_watcher.changed():
+            update_counters()
+    except sqlite3.Error as exc:
+        timings.configured().log.warning("Zähler nicht geprüft: %s", exc)
+    finally:
+        fenster.after(int(settings()["counters"].getfloat("poll_seconds") * 1000), watch_counters)
+
+# Die DB wird beim Start im Worker geöffnet, der erste Blick auf
+# data_version folgt nach poll_seconds
+def start_counters():
+    update_counters()
+    fenster.after(int(settings()["counters"].getfloat("poll_seconds") * 1000), watch_counters)
+
+def show_counters():
+    if counters_db is None:
+        return
+    totals = dict(counters_db)
+    if entry_buffer:
+        delta = entry_buffer.delta(*year_range(datetime.now().year))
+        totals = {c: totals[c] + delta[c] for c in totals}
+    labelzaehlerb.config(text=str(totals["valueb"]))
+    labelzaehlerks.config(text=str(totals["valueks"]))
+    labelzaehlera.config(text=str(totals["valuea"]))
+    labelzaehlerv.config(text=str(totals["valuev"]))
 
 
 # ---------------------------------------------------------------------------
-# Eingabefunktionen
+# Eingabepuffer (statisticus.ini: [buffer] enabled = yes)
 # ---------------------------------------------------------------------------
-def speichern():
-    def to_int_strict(value, field_name):
-        value = value.strip()
+# Es läuft immer höchstens ein Schreibvorgang im Worker; danach werden die
+# Zähler aus der Datenbank neu gelesen.
+# Ein Fehler (z.B. Netzlaufwerk weg) wird nur einmal gemeldet, die Eingaben
+# bleiben im Journal und der nächste Versuch folgt nach flush_seconds.
+entry_buffer = None
+flush_running = False
+flush_failed = False
+
+def flush_buffer():
+    global flush_running
+    if flush_running or not entry_buffer.pending():
+        return
+    flush_running = True
+
+    def done(count):
+        global flush_failed
+        flush_failed = False
+
+    def failed(exc):
+        global flush_failed
+        if not flush_failed:
+            messagebox.showerror("Fehler", f"Eingaben konnten nicht gespeichert werden, "
+                                           f"neuer Versuch folgt:\n{exc}")
+        flush_failed = True
+
+    def finished():
+        global flush_running
+        flush_running = False
+        update_counters()
+
+    worker.submit(lambda job: entry_buffer.flush(), on_done=done, on_error=failed, on_finish=finished)
+
+def flush_periodically():
+    flush_buffer()
+    fenster.after(int(entry_buffer.flush_seconds * 1000), flush_periodically)
 
-        # Leeres Feld → 0 speichern
-        if value == "":
-            return 0
 
-        # Prüfen, ob nur Ziffern eingegeben wurden (keine Kommas, keine Punkte)
-        if not value.isdigit():
-            messagebox.showerror("Fehler",
-                                 f"Ungültige Eingabe im Feld '{field_name}'.\nBitte nur ganze Zahlen eingeben.")
-            raise ValueError("Ungültige Eingabe")
+# ---------------------------------------------------------------------------
+# Hintergrund-Worker
+# ---------------------------------------------------------------------------
+# DB-Abfragen und Export laufen in Worker-Threads, damit das Fenster
+# bedienbar bleibt. Tk darf nur im Hauptthread angefasst werden: Ergebnisse
+# gehen über eine Queue zurück, die per after() abgefragt wird, und alle
+# Callbacks (on_done, on_error, on_progress, on_finish) laufen dort.
+class Cancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, worker, task, on_done, on_error, on_progress, on_finish):
+        self.worker = worker
+        self.task = task
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_finish = on_finish
+        self._cancel = threading.Event()
+        self._conn = None
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    # Bricht auch eine gerade laufende SQLite-Abfrage des Jobs ab
+    def cancel(self):
+        self._cancel.set()
+        conn = self._conn
+        if conn is not None:
+            conn.interrupt()
+
+    # Von der Aufgabe zwischen einzelnen Schritten aufzurufen
+    def check(self):
+        if self.cancelled:
+            raise Cancelled()
+
+    def progress(self, text):
+        self.worker._results.put((self, "progress", text))
+
+
+class Worker:
+    def __init__(self, root, threads=2, poll_ms=50, on_busy=None):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.on_busy = on_busy
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._pending = set()
+        self._threads = [threading.Thread(target=self._run, daemon=True) for _ in range(threads)]
+        for thread in self._threads:
+            thread.start()
+        self.root.after(self.poll_ms, self._poll)
+
+    # task(job) läuft im Worker-Thread, der Rückgabewert geht an on_done
+    def submit(self, task, on_done=None, on_error=None, on_progress=None, on_finish=None):
+        job = Job(self, task, on_done, on_error, on_progress, on_finish)
+        self._pending.add(job)
+        if len(self._pending) == 1 and self.on_busy:
+            self.on_busy(True)
+        self._jobs.put(job)
+        return job
+
+    def shutdown(self):
+        for job in list(self._pending):
+            job.cancel()
+        for _ in self._threads:
+            self._jobs.put(None)
+
+    # Die Verbindung wird im try geholt: kann die Datenbank nicht geöffnet
+    # werden (gesperrt, Rechte), bekommt der Job den Fehler und der Thread
+    # läuft weiter; der nächste Job versucht es erneut.
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            try:
+                job._conn = db.connection()
+                job.check()
+                result = job.task(job)
+                job.check()
+            except Exception as exc:
+                # Abbruch über interrupt() kommt als sqlite3-Fehler an
+                self._results.put((job, "cancelled" if job.cancelled else "error", exc))
+            else:
+                self._results.put((job, "done", result))
+            finally:
+                job._conn = None
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    job, kind, value = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    self._deliver(job, kind, value)
+                except Exception:
+                    self.root.report_callback_exception(*sys.exc_info())
+        finally:
+            self.root.after(self.poll_ms, self._poll)
+
+    def _deliver(self, job, kind, value):
+        if kind == "progress":
+            if job.on_progress and not job.cancelled:
+                job.on_progress(value)
+            return
+
+        self._pending.discard(job)
+        if not self._pending and self.on_busy:
+            self.on_busy(False)
+        if job.on_finish:
+            job.on_finish()
+        if kind == "done" and job.on_done:
+            job.on_done(value)
+        elif kind == "error":
+            if job.on_error:
+                job.on_error(value)
+            else:
+                messagebox.showerror("Fehler", str(value))
 
-        return int(value)
 
+# ---------------------------------------------------------------------------
+# Wartung (statisticus.ini: [maintenance] enabled = yes)
+# ---------------------------------------------------------------------------
+# Sicherung, Statistiken und freie Seiten im Worker, sobald das Fenster
+# idle_minutes lang ohne Tastendruck und Mausklick war und die letzte
+# Sicherung (auch die eines anderen Platzes) älter als backup_hours ist.
+# Eingaben währenddessen warten nicht, siehe statisticus_core.maintain.
+last_activity = time.monotonic()
+maintenance_running = False
+
+def touch(event=None):
+    global last_activity
+    last_activity = time.monotonic()
+
+def maintain_when_idle():
+    global maintenance_running
+    config = settings()["maintenance"]
+    idle = time.monotonic() - last_activity >= config.getfloat("idle_minutes") * 60
+    if idle and not maintenance_running and backup_due():
+        maintenance_running = True
+
+        def finished():
+            global maintenance_running
+            maintenance_running = False
+
+        # Fehler landen im Zeitprotokoll, kein Dialog an einem unbesetzten Platz
+        def failed(exc):
+            timings.configured().log.warning("Wartung fehlgeschlagen: %s", exc)
+
+        worker.submit(lambda job: maintain(job=job), on_error=failed, on_finish=finished)
+    fenster.after(60_000, maintain_when_idle)
+
+
+# ---------------------------------------------------------------------------
+# Eingabefunktionen
+# ---------------------------------------------------------------------------
+def speichern():
     try:
         zb = to_int_strict(benutzeranzahl.get(), "BenutzerInnen")
         zks = to_int_strict(kopie_scan.get(), "Kopie/Scan")
         za = to_int_strict(anfrage.get(), "Anfrage")
         zv = to_int_strict(visitor.get(), "BesucherInnen")
 
-    except ValueError:
+    except ValueError as exc:
+        messagebox.showerror("Fehler", str(exc))
         return  # NICHT speichern bei Fehler
 
-    insert_data(zb, zks, za, zv)
-    update_counters()
+    if entry_buffer:
+        if entry_buffer.add(zb, zks, za, zv):
+            flush_buffer()
+        show_counters()
+    else:
+        insert_data(zb, zks, za, zv)
+        update_counters()
 
     # Felder leeren
     benutzeranzahl.delete(0, END)
@@ -110,10 +321,63 @@ def speichern():
     visitor.delete(0, END)
 
 
+# ---------------------------------------------------------------------------
+# Import-Dialog
+# ---------------------------------------------------------------------------
+def import_dialog():
+    path = filedialog.askopenfilename(
+        parent=fenster, title="Zählungen importieren",
+        filetypes=[("CSV oder Excel", "*.csv *.xlsx"), ("Alle Dateien", "*.*")])
+    if not path:
+        return
+
+    ImportButton.state(["disabled"])
+
+    def finished():
+        ImportButton.state(["!disabled"])
+        update_counters()
+
+    def done(summary):
+        text = f"{summary['imported']} Zeilen importiert, {summary['rejected']} abgelehnt."
+        if summary["rejects_path"]:
+            text += f"\n\nAbgelehnte Zeilen mit Grund:\n{summary['rejects_path']}"
+        messagebox.showinfo("Import", text)
+
+    worker.submit(lambda job: import_file(path, job=job), on_done=done, on_finish=finished)
+
+
 # ---------------------------------------------------------------------------
 # Analyzer-Fenster
 # ---------------------------------------------------------------------------
+# Summen-Schnappschuss (statisticus.ini: [analyzer] snapshot): wird beim
+# ersten Öffnen des Analyzers im Hintergrund geladen und gilt für die ganze
+# Sitzung. Bis er bereit ist – oder ohne numpy – rechnet SQLite.
+snapshot = None
+snapshot_requested = False
+
+def load_snapshot():
+    global snapshot, snapshot_requested
+    if snapshot_requested:
+        return
+    snapshot_requested = True
+    snapshot = snapshot_from_settings()
+    if snapshot:
+        # Schlägt das Laden fehl, bleibt es bei SQL-Abfragen
+        worker.submit(lambda job: snapshot.load(), on_error=lambda exc: None)
+
+def query_totals(columns, date_from, date_to):
+    if snapshot and snapshot.loaded():
+        snapshot.refresh()
+        return snapshot.totals(columns, date_from, date_to)
+    totals = aggregate(columns, date_from, date_to)[None]
+    return {c: totals[c]["sum"] for c in columns}
+
+
 def open_analyzer():
+    from tkcalendar import DateEntry
+
+    load_snapshot()
+
     analyzer = Toplevel(fenster)
     analyzer.title("Statisticus Analyse – StAn v2.0")
     analyzer.geometry("390x500")
@@ -180,7 +444,7 @@ def open_analyzer():
         # Datumswerte sichern, bevor Analyzer geschlossen wird
         date_from_val = start_date.get_date()
         date_to_val = end_date.get_date()
-        dt_to_val = f"{date_to_val} 23:59:59"
+        range_from, range_to = day_range(date_from_val, date_to_val)
 
         # Analyzer schließen
         analyzer.destroy()
@@ -188,137 +452,329 @@ def open_analyzer():
         # Ergebnisfenster öffnen
         result = Toplevel(fenster)
         result.title("Ergebnis")
-        result.geometry("390x500")
+        result.geometry("390x600")
         result.focus_set()
 
-        # Daten aus DB abrufen
-        with sqlite3.connect(DB_NAME) as conn:
-            cur = conn.cursor()
-            def get_value(column, date_from, date_to):
-                cur.execute(f"""
-                    SELECT TOTAL({column})
-                    FROM Statistik
-                    WHERE today BETWEEN ? AND ?
-                """, (str(date_from), f"{date_to} 23:59:59"))
-                return int(cur.fetchone()[0] or 0)
-
-                # Frame für Ergebnis-Labels
-            result_frame = Frame(result)
-            result_frame.pack(pady=(30, 30))
-
-            # Ergebnis-Labels dynamisch einfügen
-            if var_b.get():
-                Label(result_frame, text=f"BenutzerInnen: {get_value('valueb', date_from_val, date_to_val)}")\
-                    .pack(anchor=W, padx=30, pady=5)
-            if var_a.get():
-                Label(result_frame, text=f"Anfragen: {get_value('valuea', date_from_val, date_to_val)}")\
-                    .pack(anchor=W, padx=30, pady=5)
-            if var_k.get():
-                Label(result_frame, text=f"Kopien/Scans: {get_value('valueks', date_from_val, date_to_val)}")\
-                    .pack(anchor=W, padx=30, pady=5)
-            if var_v.get():
-                Label(result_frame, text=f"BesucherInnen: {get_value('valuev', date_from_val, date_to_val)}")\
+        # Links Ergebnisse und Buttons, rechts das Diagramm (sobald angefordert)
+        left = Frame(result, width=390)
+        left.pack(side=LEFT, fill=Y)
+        left.pack_propagate(False)
+        chart_frame = Frame(result)
+
+        selected = [column for column, var in (("valueb", var_b), ("valuea", var_a),
+                                               ("valueks", var_k), ("valuev", var_v)) if var.get()]
+
+        # Frame für Ergebnis-Labels
+        result_frame = Frame(left)
+        result_frame.pack(pady=(30, 30))
+
+        # --- Fortschritt + Abbrechen, solange Hintergrundaufgaben laufen ---
+        busy_frame = Frame(left)
+        busy_label = Label(busy_frame, font=("Calibri", 9))
+        busy_label.pack()
+        busy_bar = ttk.Progressbar(busy_frame, mode="indeterminate", length=200)
+        busy_bar.pack(pady=5)
+        jobs = []
+
+        def cancel_jobs():
+            for job in list(jobs):
+                job.cancel()
+
+        ttk.Button(busy_frame, text="Abbrechen", command=cancel_jobs).pack()
+
+        def run_in_background(task, on_done, text, on_error=None):
+            def finished():
+                jobs.remove(job)
+                if not jobs and result.winfo_exists():
+                    busy_bar.stop()
+                    busy_frame.pack_forget()
+
+            def done(value):
+                if result.winfo_exists():
+                    on_done(value)
+
+            job = worker.submit(task, on_done=done, on_error=on_error, on_finish=finished,
+                                on_progress=lambda text: busy_label.config(text=text))
+            jobs.append(job)
+            busy_label.config(text=text)
+            if not busy_frame.winfo_manager():
+                busy_frame.pack(side=BOTTOM, pady=(0, 20))
+                busy_bar.start(10)
+
+        # Fenster schließen bricht laufende Aufgaben ab
+        def close_result():
+            cancel_jobs()
+            result.destroy()
+
+        result.protocol("WM_DELETE_WINDOW", close_result)
+
+        # Summen aus dem Schnappschuss bzw. der DB – alle angehakten Werte auf einmal
+        def show_totals(totals):
+            labels = {"valueb": "BenutzerInnen", "valuea": "Anfragen",
+                      "valueks": "Kopien/Scans", "valuev": "BesucherInnen"}
+            for column in selected:
+                Label(result_frame, text=f"{labels[column]}: {totals[column]}")\
                     .pack(anchor=W, padx=30, pady=5)
 
-        # --- Funktion zum Plotten ---
-        def plot_view():
-            verbindung = sqlite3.connect(DB_NAME)
-            df = pd.read_sql_query(
-                "SELECT * from Statistik WHERE today BETWEEN ? AND ?",
-                verbindung, params=(str(date_from_val), f"{date_to_val} 23:59:59")
-            )
+        run_in_background(lambda job: query_totals(selected, range_from, range_to),
+                          show_totals, "Abfrage läuft …")
 
-            if df.empty:
+        # --- Funktion zum Plotten ---
+        # Summen je Zeitabschnitt im Hintergrund, Zeichnen im Tk-Thread in eine
+        # eingebettete Figure, die bei jedem weiteren Aufruf wiederverwendet wird
+        # (Verlauf und Auslastung wechseln sich darin ab)
+        chart = {}
+        title = f"{date_from_val} bis {date_to_val}"
+
+        def chart_figure():
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+
+            if not chart:
+                result.geometry("1100x600")
+                chart_frame.pack(side=RIGHT, fill=BOTH, expand=True)
+                chart["figure"] = Figure(figsize=(7, 4.5), dpi=100)
+                chart["canvas"] = FigureCanvasTkAgg(chart["figure"], master=chart_frame)
+                NavigationToolbar2Tk(chart["canvas"], chart_frame).pack(side=BOTTOM, fill=X)
+                chart["canvas"].get_tk_widget().pack(side=TOP, fill=BOTH, expand=True)
+            return chart["figure"]
+
+        def show_plot(data):
+            bucket, x, series = data
+            if not x:
                 messagebox.showinfo("Info", "Keine Daten im gewählten Zeitraum.")
-                verbindung.close()
                 return
 
-            # UTC → lokale Zeit
-            d = pd.to_datetime(df['today'])
-            local = d.dt.tz_localize("UTC").dt.tz_convert('Europe/Vienna').dt.tz_localize(None)
-            df['localtime'] = local.astype(str)
-            df['time'] = df['localtime'].str[-8:]
-            df['date'] = df['localtime'].str[:10]
-
-            # Spalten umbenennen
-            df = df.rename(columns={
-                "date": "Datum",
-                "valueb": "BenutzerIn",
-                "valueks": "Kopie/Scan",
-                "valuea": "Anfrage",
-                "valuev": "BesucherIn",
-                "time": "Uhrzeit"
-            })
-
-            df = df.set_index('Uhrzeit').sort_index()
-            for col in ["BenutzerIn", "Kopie/Scan", "Anfrage", "BesucherIn"]:
-                df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
-
-            # Plot je nach Auswahl
-            if var_b.get() == 1:
-                df[['BenutzerIn']].plot(color='blue', title=f"{date_from_val} bis {date_to_val}")
-                plt.ylim(bottom=0)
-            if var_a.get() == 1:
-                df[['Anfrage']].plot(color='red', title=f"{date_from_val} bis {date_to_val}")
-            if var_k.get() == 1:
-                df[['Kopie/Scan']].plot(color='orange', title=f"{date_from_val} bis {date_to_val}")
-            if var_v.get() == 1:
-                df[['BesucherIn']].plot(color='green', title=f"{date_from_val} bis {date_to_val}")
-
-            plt.show()
-            verbindung.close()
-
-        # --- Funktion zum Excel-Export ---
-        def export_excel():
-            with sqlite3.connect(DB_NAME) as conn:
-                df = pd.read_sql_query(
-                    "SELECT * FROM Statistik WHERE today BETWEEN ? AND ?",
-                    conn, params=(str(date_from_val), f"{date_to_val} 23:59:59")
-                )
+            figure = chart_figure()
+            with timings.measure("draw_plot", rows=len(x)):
+                figure.clear()
+                draw_series(figure.add_subplot(), bucket, x, series, title)
+                chart["canvas"].draw()
 
-            if df.empty:
-                messagebox.showinfo("Info", "Keine Daten zum Exportieren.")
-                return
+        def plot_view():
+            run_in_background(lambda job: plot_series(selected, range_from, range_to),
+                              show_plot, "Diagrammdaten werden geladen …")
+
+        # --- Auslastung nach Wochentag und Stunde, wahlweise eines Monats ---
+        heatmap_month = StringVar(value="Alle Monate")
 
-            # Lokale Zeit
-            d = pd.to_datetime(df['today'])
-            local = d.dt.tz_localize("UTC").dt.tz_convert('Europe/Vienna').dt.tz_localize(None)
-            df['localtime'] = local.astype(str)
+        def selected_month():
+            month = heatmap_month.get()
+            return MONTH_LABELS.index(month) + 1 if month in MONTH_LABELS else None
 
-            # Spalten umbenennen
-            df = df.rename(columns={
-                "today": "utc-timestamp",
-                "valueb": "BenutzerIn",
-                "valueks": "Kopie/Scan",
-                "valuea": "Anfrage",
-                "valuev": "BesucherIn",
-                "localtime": "Datum"
-            })
+        def show_heatmap(grids):
+            if grids is None:
+                messagebox.showinfo("Info", "Keine Daten im gewählten Zeitraum.")
+                return
 
-            df = df.drop(columns=["utc-timestamp"])
+            figure = chart_figure()
+            with timings.measure("draw_heatmap"):
+                month = selected_month()
+                drawn = draw_heatmap(figure, grids, f"{title}, {MONTH_LABELS[month - 1]}" if month else title)
+                chart["canvas"].draw()
+            if not drawn:
+                messagebox.showinfo("Info", "Keine Daten im gewählten Zeitraum.")
 
-            path = os.path.join(os.getcwd(), "statisticus_export.xlsx")
+        def heatmap_view():
+            month = selected_month()
+            run_in_background(lambda job: heatmap(selected, range_from, range_to, by_month=bool(month)).get(month),
+                              show_heatmap, "Auslastung wird berechnet …")
+
+        # --- Funktion zum Export (nur die angehakten Werte) ---
+        export_format = StringVar(value=EXPORT_FORMATS["xlsx"][0])
+        export_new_only = BooleanVar(value=False)
+
+        def selected_format():
+            return next(key for key, (label, _) in EXPORT_FORMATS.items() if label == export_format.get())
+
+        def write_export(fmt):
+            def task(job):
+                path = os.path.join(os.getcwd(), f"statisticus_export.{fmt}")
+                job.progress("Daten werden gelesen …")
+                if export_data(path, fmt, selected, range_from, range_to, job=job) == 0:
+                    return None
+                return path
+            return task
+
+        def export_done(path):
+            if path is None:
+                messagebox.showinfo("Info", "Keine Daten zum Exportieren.")
+                return
 
             try:
-                df.to_excel(path, index=False)
-            except PermissionError:
+                os.startfile(path)
+            except Exception:
+                messagebox.showinfo("Export", f"Datei gespeichert unter:\n{path}")
+
+        def export_failed(exc):
+            if isinstance(exc, PermissionError):
                 messagebox.showerror(
                     "Fehler",
-                    "Die Excel-Datei ist bereits geöffnet.\nBitte schließen Sie sie und versuchen Sie es erneut."
+                    "Die Exportdatei ist bereits geöffnet.\nBitte schließen Sie sie und versuchen Sie es erneut."
                 )
-                return
+            else:
+                messagebox.showerror("Fehler", f"Export fehlgeschlagen:\n{exc}")
+
+        # Fortlaufend: alle Einträge seit dem letzten Lauf in ein gewähltes Ziel,
+        # unabhängig vom Zeitraum. Je Spaltenauswahl ein eigenes Ziel (Vorschlag im Namen).
+        def write_incremental(fmt, path):
+            def task(job):
+                job.progress("Neue Einträge werden gelesen …")
+                return export_incremental(path, fmt, selected, job=job)["file"]
+            return task
 
+        def export_excel():
+            fmt = selected_format()
+            if export_new_only.get():
+                path = filedialog.asksaveasfilename(
+                    parent=result, title="Fortlaufender Export", initialdir=os.getcwd(),
+                    initialfile=f"statisticus_fortlaufend_{'_'.join(selected)}.{fmt}",
+                    defaultextension=f".{fmt}", confirmoverwrite=False,
+                    filetypes=[(EXPORT_FORMATS[fmt][0], f"*.{fmt}"), ("Alle Dateien", "*.*")])
+                if not path:
+                    return
+                run_in_background(write_incremental(fmt, path), export_done, "Export läuft …",
+                                  on_error=export_failed)
+                return
+            run_in_background(write_export(fmt), export_done, "Export läuft …", on_error=export_failed)
+
+        # Mit gewähltem Monat enthält die Datei alle Monate, je Zeile mit Monat
+        def export_heatmap_file():
+            fmt = selected_format()
+            by_month = selected_month() is not None
+
+            def task(job):
+                path = os.path.join(os.getcwd(), f"statisticus_auslastung.{fmt}")
+                if export_heatmap(path, fmt, selected, range_from, range_to, by_month) == 0:
+                    return None
+                return path
+
+            run_in_background(task, export_done, "Export läuft …", on_error=export_failed)
+
+        # --- Vergleich mit denselben Tagen der Vorjahre: Tabelle + Balkendiagramm ---
+        compare_years = IntVar(value=1)
+
+        def show_comparison(periods):
+            with timings.measure("draw_comparison"):
+                figure = chart_figure()
+                figure.clear()
+                draw_comparison(figure.add_subplot(), periods, f"{title} und Vorjahre")
+                chart["canvas"].draw()
+
+            table = Toplevel(result)
+            table.title("Vergleich mit Vorjahren")
+            names = ["zeitraum", "eintraege"] + [f"{c}_{part}" for c in selected for part in ("sum", "delta", "pct")]
+            tree = ttk.Treeview(table, columns=names, show="headings", height=len(periods))
+            tree.heading("zeitraum", text="Zeitraum")
+            tree.heading("eintraege", text="Einträge")
+            tree.column("zeitraum", width=170)
+            tree.column("eintraege", width=70, anchor=E)
+            for c in selected:
+                for part, text in (("sum", COLUMN_LABELS[c]), ("delta", "Δ"), ("pct", "Δ %")):
+                    tree.heading(f"{c}_{part}", text=text)
+                    tree.column(f"{c}_{part}", width=90 if part == "sum" else 60, anchor=E)
+            for period in periods:
+                cells = [period["label"], period["count"]]
+                for c in selected:
+                    delta, percent = period["delta"][c], period["percent"][c]
+                    cells += [period["sums"][c], "" if delta is None else f"{delta:+}",
+                              "" if percent is None else f"{percent:+} %"]
+                tree.insert("", END, values=cells)
+            tree.pack(padx=20, pady=(20, 10))
+            years = len(periods) - 1
+
+            def export_table():
+                fmt = selected_format()
+
+                def task(job):
+                    path = os.path.join(os.getcwd(), f"statisticus_vergleich.{fmt}")
+                    export_comparison(path, fmt, selected, date_from_val, date_to_val, years)
+                    return path
+
+                run_in_background(task, export_done, "Export läuft …", on_error=export_failed)
+
+            ttk.Button(table, text="Export", style="Accent.TButton", command=export_table).pack(pady=(0, 20))
+
+        # --- Summen je Standort (statisticus.ini [locations]), parallel gerechnet ---
+        def show_locations(results):
+            table = Toplevel(result)
+            table.title("Standorte")
+            names = ["standort", "eintraege"] + selected
+            tree = ttk.Treeview(table, columns=names, show="headings", height=len(results))
+            tree.heading("standort", text="Standort")
+            tree.heading("eintraege", text="Einträge")
+            tree.column("standort", width=140)
+            tree.column("eintraege", width=80, anchor=E)
+            for c in selected:
+                tree.heading(c, text=COLUMN_LABELS[c])
+                tree.column(c, width=100, anchor=E)
+            for name, groups in results.items():
+                values = groups.get(None)
+                cells = [values[c]["sum"] for c in selected] if values else [0] * len(selected)
+                tree.insert("", END, values=[name, values[selected[0]]["count"] if values else 0] + cells)
+            tree.pack(padx=20, pady=(20, 10))
+
+            def export_table():
+                fmt = selected_format()
+
+                def task(job):
+                    path = os.path.join(os.getcwd(), f"statisticus_standorte.{fmt}")
+                    export_locations(path, fmt, selected, range_from, range_to)
+                    return path
+
+                run_in_background(task, export_done, "Export läuft …", on_error=export_failed)
+
+            ttk.Button(table, text="Export", style="Accent.TButton", command=export_table).pack(pady=(0, 20))
+
+        def locations_view():
+            run_in_background(lambda job: aggregate_locations(selected, range_from, range_to),
+                              show_locations, "Standorte werden abgefragt …")
+
+        def comparison_view():
             try:
-                os.startfile(path)
-            except Exception:
-                messagebox.showinfo("Export", f"Excel-Datei gespeichert unter:\n{path}")
+                years = compare_years.get()
+            except TclError:
+                years = 0
+            if years < 1:
+                messagebox.showerror("Fehler", "Bitte die Anzahl der Vorjahre als ganze Zahl angeben.")
+                return
+            run_in_background(lambda job: compare_periods(selected, date_from_val, date_to_val, years),
+                              show_comparison, "Vergleich wird berechnet …")
 
         # Buttons für Plot und Excel
         
-        ttk.Button(result, text="Excel-Export", style="Accent.TButton", command=export_excel)\
-            .pack(pady=(60, 20))
-        ttk.Button(result, text="Diagramme ansehen", style="Accent.TButton", command=plot_view)\
+        export_frame = Frame(left)
+        export_frame.pack(pady=(60, 5))
+        ttk.Combobox(export_frame, textvariable=export_format, state="readonly", width=16,
+                     values=[label for label, _ in EXPORT_FORMATS.values()])\
+            .pack(side=LEFT, padx=(0, 10))
+        ttk.Button(export_frame, text="Export", style="Accent.TButton", command=export_excel)\
+            .pack(side=LEFT)
+        ttk.Checkbutton(left, text="Nur neue Einträge (fortlaufend)", variable=export_new_only)\
+            .pack()
+        ttk.Button(left, text="Diagramme ansehen", style="Accent.TButton", command=plot_view)\
             .pack(pady=20)
+
+        heatmap_frame = Frame(left)
+        heatmap_frame.pack()
+        ttk.Combobox(heatmap_frame, textvariable=heatmap_month, state="readonly", width=12,
+                     values=["Alle Monate"] + list(MONTH_LABELS))\
+            .pack(side=LEFT, padx=(0, 10))
+        ttk.Button(heatmap_frame, text="Auslastung", style="Accent.TButton", command=heatmap_view)\
+            .pack(side=LEFT, padx=(0, 10))
+        ttk.Button(heatmap_frame, text="Export", command=export_heatmap_file)\
+            .pack(side=LEFT)
+
+        compare_frame = Frame(left)
+        compare_frame.pack(pady=(20, 0))
+        Label(compare_frame, text="Vorjahre:").pack(side=LEFT, padx=(0, 5))
+        ttk.Spinbox(compare_frame, from_=1, to=10, textvariable=compare_years, width=4)\
+            .pack(side=LEFT, padx=(0, 10))
+        ttk.Button(compare_frame, text="Vergleich", style="Accent.TButton", command=comparison_view)\
+            .pack(side=LEFT)
+        if locations():
+            ttk.Button(compare_frame, text="Standorte", style="Accent.TButton", command=locations_view)\
+                .pack(side=LEFT, padx=(10, 0))
         
 
         
@@ -327,117 +783,210 @@ def open_analyzer():
        
 
 
-# ---------------------------------------------------------------------------
-# Hauptfenster – Eingabetool
-# ---------------------------------------------------------------------------
-fenster = Tk()
-fenster.geometry("600x735")
-fenster.title("Statisticus v2.0")
-fenster.grid_columnconfigure(1, weight=1)
-# Theme (azure.tcl muss im selben Ordner liegen)
-try:
-    fenster.tk.call("source", "azure.tcl")
-    fenster.tk.call("set_theme", "dark")
-except Exception:
-    pass
+# Nur beim Start als Programm – der Import des Moduls öffnet kein Fenster
+if __name__ == "__main__":
+    # ---------------------------------------------------------------------------
+    # Kommandozeile
+    # ---------------------------------------------------------------------------
+    # Berichte, Export, Import und Wartung ohne Fenster: siehe statisticus.py
+    parser = argparse.ArgumentParser(description="Statisticus – Eingabe + Analyzer")
+    parser.add_argument("--startup-time", action="store_true",
+                        help="Zeit bis zum bedienbaren Eingabefenster messen und beenden")
+    args = parser.parse_args()
+
+    # ---------------------------------------------------------------------------
+    # Hauptfenster – Eingabetool
+    # ---------------------------------------------------------------------------
+    fenster = Tk()
+    fenster.geometry("600x735")
+    fenster.title("Statisticus v2.0")
+    fenster.grid_columnconfigure(1, weight=1)
+
+    # Hintergrundaufgaben + Anzeige, solange eine davon läuft
+    busy_indicator = ttk.Progressbar(fenster, mode="indeterminate", length=120)
+
+    def show_busy(busy):
+        if busy:
+            busy_indicator.grid(row=10, column=1, pady=(40, 10), sticky=S)
+            busy_indicator.start(10)
+        else:
+            busy_indicator.stop()
+            busy_indicator.grid_remove()
 
-def change_theme():
+    worker = Worker(fenster, on_busy=show_busy)
+    # Theme (azure.tcl muss im selben Ordner liegen)
     try:
-        if fenster.tk.call("ttk::style", "theme", "use") == "azure-dark":
-            fenster.tk.call("set_theme", "light")
-        else:
-            fenster.tk.call("set_theme", "dark")
+        fenster.tk.call("source", "azure.tcl")
+        fenster.tk.call("set_theme", "dark")
     except Exception:
         pass
 
-switch = ttk.Checkbutton(fenster, text="💡 Switch", style="Switch.TCheckbutton", command=change_theme)
-
-# Eingabe-GUI (Labels + Entries)
-date_today = datetime.now()
-labeltoday = Label(fenster, text=f"{date_today:%A, %B %d, %Y}", font=("Calibri", 8))
-
-labelbenutzer = Label(fenster, text="BenutzerIn:", font=("Calibri", 13))
-labelkopie_scan = Label(fenster, text="Kopie/Scan:", font=("Calibri", 13))
-labelanfrage = Label(fenster, text="Anfrage:", font=("Calibri", 13))
-labelvisitor = Label(fenster, text="BesucherIn:", font=("Calibri", 13))
-
-benutzeranzahl = ttk.Entry(fenster, width=12, font=("Calibri", 13))
-kopie_scan = ttk.Entry(fenster, width=12, font=("Calibri", 13))
-anfrage = ttk.Entry(fenster, width=12, font=("Calibri", 13))
-visitor = ttk.Entry(fenster, width=12, font=("Calibri", 13))
-
-# Enter-Taste speichert
-benutzeranzahl.bind("<Return>", lambda e: speichern())
-kopie_scan.bind("<Return>", lambda e: speichern())
-anfrage.bind("<Return>", lambda e: speichern())
-visitor.bind("<Return>", lambda e: speichern())
-
-# Jahres-Zähler-Labels
-labelgesamtb = Label(fenster, text="BenutzerInnen lfd. Jahr:", font=("Calibri", 11))
-labelgesamtk = Label(fenster, text="Kopien/Scans lfd. Jahr:", font=("Calibri", 11))
-labelgesamta = Label(fenster, text="Anfragen lfd. Jahr:", font=("Calibri", 11))
-labelgesamtv = Label(fenster, text="BesucherInnen lfd. Jahr:", font=("Calibri", 11))
-
-labelzaehlerb = Label(fenster, text=str(get_total_year("valueb")), font=("Calibri", 11))
-labelzaehlerks = Label(fenster, text=str(get_total_year("valueks")), font=("Calibri", 11))
-labelzaehlera = Label(fenster, text=str(get_total_year("valuea")), font=("Calibri", 11))
-labelzaehlerv = Label(fenster, text=str(get_total_year("valuev")), font=("Calibri", 11))
-
-SpeichernButton = ttk.Button(fenster, text="SPEICHERN", style="Accent.TButton", width=16, command=speichern)
-AnalyzerButton = ttk.Button(fenster, text="ABFRAGE", style="Accent.TButton", width=16, command=open_analyzer)
-BeendenButton = ttk.Button(fenster, text="BEENDEN", style="Accent.TButton", width=16, command=fenster.quit)
-# ---------------------------------------------------------------------------
-# Layout (grid) – Korrigierte Platzierung (Eingabefelder bleiben sichtbar)
-# ---------------------------------------------------------------------------
-
-# Zeile 0..3: Eingabefelder
-labelbenutzer.grid(row=0, column=0, padx=50, pady=(30, 12), sticky=W)
-benutzeranzahl.grid(row=0, column=2, pady=(30, 12))
-
-labelkopie_scan.grid(row=1, column=0, padx=50, pady=12, sticky=W)
-kopie_scan.grid(row=1, column=2, pady=12)
-
-labelanfrage.grid(row=2, column=0, padx=50, pady=12, sticky=W)
-anfrage.grid(row=2, column=2, pady=12)
-
-labelvisitor.grid(row=3, column=0, padx=50, pady=12, sticky=W)
-visitor.grid(row=3, column=2, pady=12)
-
-# Zeile 4..7: Jahres-Gesamtlabels
-labelgesamtb.grid(row=4, column=0, padx=50, pady=(60,8), sticky=W)
-labelzaehlerb.grid(row=4, column=2, pady=(60,8))
-
-labelgesamtk.grid(row=5, column=0, padx=50, pady=8, sticky=W)
-labelzaehlerks.grid(row=5, column=2, pady=8)
-
-labelgesamta.grid(row=6, column=0, padx=50, pady=8, sticky=W)
-labelzaehlera.grid(row=6, column=2, pady=8)
-
-labelgesamtv.grid(row=7, column=0, padx=50, pady=8, sticky=W)
-labelzaehlerv.grid(row=7, column=2, pady=8)
-
-# ---------------------------------------------------------------------------
-# Button-Layout (klassisch, stabil)
-# ---------------------------------------------------------------------------
-
-# Abfrage links mit identischem Einzug wie die Labels
-AnalyzerButton.grid(row=8, column=0, padx=50, pady=(40,10), sticky=W)
-
-# Speichern rechts unter den Eingabefeldern
-SpeichernButton.grid(row=8, column=2, padx=50, pady=(40,10), sticky=E)
-
-
-# Beenden zentriert darunter
-BeendenButton.grid(row=9, column=1, pady=(40,20))
-
+    def change_theme():
+        try:
+            if fenster.tk.call("ttk::style", "theme", "use") == "azure-dark":
+                fenster.tk.call("set_theme", "light")
+            else:
+                fenster.tk.call("set_theme", "dark")
+        except Exception:
+            pass
 
-# Datum ganz unten links
-switch.grid(row=10, column=0, padx=50, pady=(40, 10), sticky=SW)
+    switch = ttk.Checkbutton(fenster, text="💡 Switch", style="Switch.TCheckbutton", command=change_theme)
+
+    # Eingabe-GUI (Labels + Entries)
+    date_today = datetime.now()
+    labeltoday = Label(fenster, text=f"{date_today:%A, %B %d, %Y}", font=("Calibri", 8))
 
-# Switch ganz unten rechts
-labeltoday.grid(row=10, column=2, padx=50, pady=(40, 10), sticky=SE)
+    labelbenutzer = Label(fenster, text="BenutzerIn:", font=("Calibri", 13))
+    labelkopie_scan = Label(fenster, text="Kopie/Scan:", font=("Calibri", 13))
+    labelanfrage = Label(fenster, text="Anfrage:", font=("Calibri", 13))
+    labelvisitor = Label(fenster, text="BesucherIn:", font=("Calibri", 13))
 
+    benutzeranzahl = ttk.Entry(fenster, width=12, font=("Calibri", 13))
+    kopie_scan = ttk.Entry(fenster, width=12, font=("Calibri", 13))
+    anfrage = ttk.Entry(fenster, width=12, font=("Calibri", 13))
+    visitor = ttk.Entry(fenster, width=12, font=("Calibri", 13))
 
-# Update Zähler und Start
-update_counters()
-fenster.mainloop()
+    # Enter-Taste speichert
+    benutzeranzahl.bind("<Return>", lambda e: speichern())
+    kopie_scan.bind("<Return>", lambda e: speichern())
+    anfrage.bind("<Return>", lambda e: speichern())
+    visitor.bind("<Return>", lambda e: speichern())
+
+    # Jahres-Zähler-Labels
+    labelgesamtb = Label(fenster, text="BenutzerInnen lfd. Jahr:", font=("Calibri", 11))
+    labelgesamtk = Label(fenster, text="Kopien/Scans lfd. Jahr:", font=("Calibri", 11))
+    labelgesamta = Label(fenster, text="Anfragen lfd. Jahr:", font=("Calibri", 11))
+    labelgesamtv = Label(fenster, text="BesucherInnen lfd. Jahr:", font=("Calibri", 11))
+
+    labelzaehlerb = Label(fenster, font=("Calibri", 11))
+    labelzaehlerks = Label(fenster, font=("Calibri", 11))
+    labelzaehlera = Label(fenster, font=("Calibri", 11))
+    labelzaehlerv = Label(fenster, font=("Calibri", 11))
+
+    SpeichernButton = ttk.Button(fenster, text="SPEICHERN", style="Accent.TButton", width=16, command=speichern)
+    AnalyzerButton = ttk.Button(fenster, text="ABFRAGE", style="Accent.TButton", width=16, command=open_analyzer)
+    BeendenButton = ttk.Button(fenster, text="BEENDEN", style="Accent.TButton", width=16, command=fenster.quit)
+    ImportButton = ttk.Button(fenster, text="IMPORT", width=16, command=import_dialog)
+    # ---------------------------------------------------------------------------
+    # Layout (grid) – Korrigierte Platzierung (Eingabefelder bleiben sichtbar)
+    # ---------------------------------------------------------------------------
+
+    # Zeile 0..3: Eingabefelder
+    labelbenutzer.grid(row=0, column=0, padx=50, pady=(30, 12), sticky=W)
+    benutzeranzahl.grid(row=0, column=2, pady=(30, 12))
+
+    labelkopie_scan.grid(row=1, column=0, padx=50, pady=12, sticky=W)
+    kopie_scan.grid(row=1, column=2, pady=12)
+
+    labelanfrage.grid(row=2, column=0, padx=50, pady=12, sticky=W)
+    anfrage.grid(row=2, column=2, pady=12)
+
+    labelvisitor.grid(row=3, column=0, padx=50, pady=12, sticky=W)
+    visitor.grid(row=3, column=2, pady=12)
+
+    # Zeile 4..7: Jahres-Gesamtlabels
+    labelgesamtb.grid(row=4, column=0, padx=50, pady=(60,8), sticky=W)
+    labelzaehlerb.grid(row=4, column=2, pady=(60,8))
+
+    labelgesamtk.grid(row=5, column=0, padx=50, pady=8, sticky=W)
+    labelzaehlerks.grid(row=5, column=2, pady=8)
+
+    labelgesamta.grid(row=6, column=0, padx=50, pady=8, sticky=W)
+    labelzaehlera.grid(row=6, column=2, pady=8)
+
+    labelgesamtv.grid(row=7, column=0, padx=50, pady=8, sticky=W)
+    labelzaehlerv.grid(row=7, column=2, pady=8)
+
+    # ---------------------------------------------------------------------------
+    # Button-Layout (klassisch, stabil)
+    # ---------------------------------------------------------------------------
+
+    # Abfrage links mit identischem Einzug wie die Labels
+    AnalyzerButton.grid(row=8, column=0, padx=50, pady=(40,10), sticky=W)
+
+    # Speichern rechts unter den Eingabefeldern
+    SpeichernButton.grid(row=8, column=2, padx=50, pady=(40,10), sticky=E)
+
+
+    # Beenden zentriert darunter, Import links daneben
+    BeendenButton.grid(row=9, column=1, pady=(40,20))
+    ImportButton.grid(row=9, column=0, padx=50, pady=(40,20), sticky=W)
+
+
+    # Datum ganz unten links
+    switch.grid(row=10, column=0, padx=50, pady=(40, 10), sticky=SW)
+
+    # Switch ganz unten rechts
+    labeltoday.grid(row=10, column=2, padx=50, pady=(40, 10), sticky=SE)
+
+    # Statuszeile: Dauer des letzten Vorgangs (statisticus.ini: status_bar = yes)
+    if timings.configured().status_bar:
+        fenster.geometry("600x765")
+        labelstatus = Label(fenster, anchor=W, font=("Calibri", 8))
+        labelstatus.grid(row=11, column=0, columnspan=3, padx=50, pady=(0, 5), sticky=EW)
+        status_fg = labelstatus.cget("fg")
+
+        def show_last_timing():
+            record = timings.last()
+            if record:
+                rows = "" if record["rows"] is None else f", {record['rows']} Zeilen"
+                labelstatus.config(text=f"Letzter Vorgang: {record['name']} – {record['ms']:.0f} ms{rows}",
+                                   fg="red" if record["ms"] >= timings.slow_ms else status_fg)
+            fenster.after(500, show_last_timing)
+
+        show_last_timing()
+
+
+    # Startzeit: vom Programmstart bis die Hauptschleife zum ersten Mal leer läuft
+    def report_startup_time():
+        elapsed_ms = (time.perf_counter() - STARTUP) * 1000
+        print(f"Eingabefenster bereit nach {elapsed_ms:.0f} ms (Ziel: {STARTUP_TARGET_MS} ms)")
+        fenster.destroy()
+        if elapsed_ms > STARTUP_TARGET_MS:
+            raise SystemExit(1)
+
+    if args.startup_time:
+        fenster.after_idle(report_startup_time)
+
+    # Eingabepuffer: Journal vom letzten Lauf im Worker nachspielen (öffnet und
+    # migriert die Datenbank), dann regelmäßig schreiben. Bis dahin und wenn das
+    # scheitert (Journal von einem anderen Fenster belegt, Datenbank gesperrt)
+    # wird ungepuffert gespeichert.
+    start_buffer = entry_buffer_from_settings()
+    if start_buffer:
+        def buffer_ready(pending):
+            global entry_buffer
+            entry_buffer = start_buffer
+            flush_periodically()
+            show_counters()
+
+        def buffer_failed(exc):
+            messagebox.showinfo("Info", f"Eingabepuffer nicht verfügbar:\n{exc}\n"
+                                        f"Eingaben werden in diesem Fenster direkt gespeichert.")
+
+        worker.submit(lambda job: start_buffer.open(), on_done=buffer_ready, on_error=buffer_failed)
+
+    maintenance = settings()["maintenance"].getboolean("enabled")
+    if maintenance:
+        fenster.bind_all("<KeyPress>", touch, add="+")
+        fenster.bind_all("<ButtonPress>", touch, add="+")
+        fenster.after(60_000, maintain_when_idle)
+
+    # Zähler lesen, dann auf Änderungen anderer Plätze achten, und Start
+    start_counters()
+    fenster.mainloop()
+    worker.shutdown()
+    # Statistiken vor dem Schließen auffrischen (dauert Millisekunden)
+    if maintenance:
+        try:
+            optimize()
+        except Exception:
+            pass
+    # BEENDEN und Fenster schließen enden beide hier: offene Eingaben schreiben
+    if entry_buffer:
+        try:
+            entry_buffer.close()
+        except Exception as exc:
+            messagebox.showerror("Fehler", f"Eingaben konnten nicht gespeichert werden, sie bleiben im Journal "
+                                           f"und werden beim nächsten Start geschrieben:\n{exc}")
+    db.close()
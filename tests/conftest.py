@@ -0,0 +1,40 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import statisticus_core as core
+
+
+# Leerer Arbeitsordner je Test; core.db zeigt auf statisticus.db darin
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    core.db.close()
+    core.cache.invalidate()
+
+
+# Datei wie vom ursprünglichen Programm geschrieben: today als UTC-Text
+# (CURRENT_TIMESTAMP), Werte ohne Typprüfung, keine weiteren Tabellen
+def baseline_database(path, count):
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE Statistik (
+            entry_number INTEGER PRIMARY KEY AUTOINCREMENT,
+            today TEXT,
+            valueb INTEGER,
+            valueks INTEGER,
+            valuea INTEGER,
+            valuev INTEGER
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO Statistik (today, valueb, valueks, valuea, valuev) VALUES (?, ?, ?, ?, ?)",
+        [(f"2024-{1 + i % 12:02d}-{1 + i % 28:02d} {8 + i % 10:02d}:15:00", i % 3, None, 1, i % 2)
+         for i in range(count)])
+    conn.commit()
+    conn.close()
@@ -0,0 +1,90 @@
+import sqlite3
+
+import pytest
+
+import statisticus_core as core
+
+
+def count_rows():
+    return core.db.execute("SELECT COUNT(*), IFNULL(SUM(valueb), 0) FROM Statistik").fetchone()
+
+
+# Programmabsturz: Dateien zu, ohne flush() und ohne das Journal neu zu schreiben
+def crash(buffer):
+    buffer._journal.close()
+    buffer._lock_file.close()
+
+
+@pytest.fixture
+def database(workdir):
+    return core.open_database("statisticus.db")
+
+
+def test_journal_is_replayed_after_crash(database):
+    buffer = core.EntryBuffer("platz.journal", "rechner/benutzer", flush_count=100)
+    assert buffer.open() == 0
+    for _ in range(3):
+        buffer.add(1, 0, 0, 0)
+    crash(buffer)
+    # Beim Absturz abgeschnittene letzte Zeile
+    with open("platz.journal", "a", encoding="utf-8") as file:
+        file.write("4;17000")
+
+    assert count_rows() == (0, 0)
+    buffer = core.EntryBuffer("platz.journal", "rechner/benutzer", flush_count=100)
+    assert buffer.open() == 3
+    assert buffer.flush() == 3
+    buffer.close()
+    assert count_rows() == (3, 3)
+    assert open("platz.journal", encoding="utf-8").read() == ""
+
+
+def test_replay_after_written_flush_does_not_write_twice(database):
+    buffer = core.EntryBuffer("platz.journal", "rechner/benutzer", flush_count=100)
+    buffer.open()
+    for _ in range(3):
+        buffer.add(1, 0, 0, 0)
+    journal = open("platz.journal", encoding="utf-8").read()
+    assert buffer.flush() == 3
+    crash(buffer)
+    # Absturz zwischen COMMIT und dem Neuschreiben des Journals
+    with open("platz.journal", "w", encoding="utf-8") as file:
+        file.write(journal)
+
+    buffer = core.EntryBuffer("platz.journal", "rechner/benutzer", flush_count=100)
+    assert buffer.open() == 0
+    assert count_rows() == (3, 3)
+    # Die laufende Nummer geht nach dem Journal weiter, nicht von vorn
+    buffer.add(1, 0, 0, 0)
+    buffer.close()
+    assert count_rows() == (4, 4)
+
+
+def test_second_process_cannot_use_the_journal(database):
+    first = core.EntryBuffer("platz.journal", "rechner/benutzer")
+    first.open()
+    second = core.EntryBuffer("platz.journal", "rechner/benutzer")
+    with pytest.raises(RuntimeError):
+        second.open()
+    first.add(1, 0, 0, 0)
+    first.close()
+    assert count_rows() == (1, 1)
+
+    # Nach dem Beenden ist das Journal wieder frei
+    second.open()
+    second.close()
+
+
+def test_failed_open_releases_the_journal(database, monkeypatch):
+    def locked(sql, params=()):
+        raise sqlite3.OperationalError("database is locked")
+
+    buffer = core.EntryBuffer("platz.journal", "rechner/benutzer")
+    with monkeypatch.context() as patch:
+        patch.setattr(core.db, "execute", locked)
+        with pytest.raises(sqlite3.OperationalError):
+            buffer.open()
+
+    buffer = core.EntryBuffer("platz.journal", "rechner/benutzer")
+    assert buffer.open() == 0
+    buffer.close()
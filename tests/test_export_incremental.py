@@ -0,0 +1,73 @@
+import csv
+
+import pytest
+
+import statisticus_core as core
+
+
+@pytest.fixture
+def database(workdir):
+    return core.open_database("statisticus.db")
+
+
+def add_entries(count):
+    for _ in range(count):
+        core.insert_data(1, 0, 2, 0)
+
+
+def csv_entries(path):
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        rows = list(csv.reader(file, delimiter=";"))
+    assert rows[0] == core.export_header(("valueb", "valuea"))
+    return [int(row[0]) for row in rows[1:]]
+
+
+def test_only_new_entries_are_appended(database):
+    add_entries(5)
+    assert core.export_incremental("out.csv", "csv", ["valueb", "valuea"])["rows"] == 5
+    assert core.export_incremental("out.csv", "csv", ["valueb", "valuea"])["file"] is None
+
+    add_entries(2)
+    result = core.export_incremental("out.csv", "csv", ["valueb", "valuea"])
+    assert (result["rows"], result["last_entry"]) == (2, 7)
+    assert csv_entries("out.csv") == list(range(1, 8))
+    manifest = core.read_manifest("out.csv")
+    assert manifest["last_entry"] == 7
+    assert [run["rows"] for run in manifest["runs"]] == [5, 2]
+
+
+def test_interrupted_csv_run_is_repeated(database, monkeypatch):
+    add_entries(5)
+    core.export_incremental("out.csv", "csv", ["valueb", "valuea"])
+    add_entries(3)
+
+    # Daten geschrieben, Manifest nicht mehr ersetzt – dazu eine halbe Zeile
+    def fail(path, manifest):
+        raise OSError("Datenträger voll")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(core, "write_manifest", fail)
+        with pytest.raises(OSError):
+            core.export_incremental("out.csv", "csv", ["valueb", "valuea"])
+    with open("out.csv", "a", encoding="utf-8") as file:
+        file.write("9;1")
+
+    assert core.export_incremental("out.csv", "csv", ["valueb", "valuea"])["rows"] == 3
+    assert csv_entries("out.csv") == list(range(1, 9))
+
+
+def test_other_columns_need_another_target(database):
+    add_entries(1)
+    core.export_incremental("out.csv", "csv", ["valueb", "valuea"])
+    with pytest.raises(ValueError):
+        core.export_incremental("out.csv", "csv", ["valueb"])
+
+
+def test_parquet_gets_one_part_per_run(database):
+    pq = pytest.importorskip("pyarrow.parquet")
+    add_entries(4)
+    assert core.export_incremental("out.parquet", "parquet", ["valueb"])["file"] == "out_0001.parquet"
+    add_entries(2)
+    assert core.export_incremental("out.parquet", "parquet", ["valueb"])["file"] == "out_0002.parquet"
+    assert pq.read_table("out_0002.parquet").column("entry_number").to_pylist() == [5, 6]
+    assert core.read_manifest("out.parquet")["parts"] == ["out_0001.parquet", "out_0002.parquet"]
@@ -0,0 +1,83 @@
+import sqlite3
+
+import pytest
+
+import statisticus_core as core
+from conftest import baseline_database
+
+
+class Interrupted(Exception):
+    pass
+
+
+# Bricht upgrade_file nach "batches" kopierten Blöcken ab
+class StopAfter:
+    def __init__(self, batches):
+        self.batches = batches
+
+    def check(self):
+        self.batches -= 1
+        if self.batches == 0:
+            raise Interrupted()
+
+    def progress(self, text):
+        pass
+
+
+def column_sums(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("""
+            SELECT COUNT(*), COUNT(DISTINCT entry_number), SUM(IFNULL(valueb, 0)), SUM(IFNULL(valueks, 0)),
+                   SUM(IFNULL(valuea, 0)), SUM(IFNULL(valuev, 0))
+            FROM Statistik
+        """).fetchone()
+    finally:
+        conn.close()
+
+
+def test_baseline_file_is_migrated_on_first_use(workdir):
+    baseline_database("statisticus.db", 500)
+    before = column_sums("statisticus.db")
+
+    db = core.open_database("statisticus.db")
+    assert db.execute("PRAGMA user_version").fetchone()[0] == len(core.MIGRATIONS)
+    assert db.execute("SELECT COUNT(*) FROM Statistik WHERE typeof(today) != 'integer'").fetchone()[0] == 0
+    assert db.execute("SELECT COUNT(*) FROM Statistik WHERE datum != date(today, 'unixepoch', 'localtime')"
+                      ).fetchone()[0] == 0
+    # Tagessummen passen zu den Rohdaten
+    assert db.execute(f"SELECT SUM(anzahl), {', '.join(f'SUM({c})' for c in core.VALUE_COLUMNS)} FROM StatistikTag"
+                      ).fetchone() == (before[0],) + before[2:]
+
+    core.insert_data(1, 0, 0, 0)
+    assert db.execute("SELECT MAX(entry_number) FROM Statistik").fetchone()[0] == 501
+    db.close()
+    assert column_sums("statisticus.db")[0] == 501
+
+
+def test_interrupted_upgrade_resumes_without_duplicates(workdir):
+    baseline_database("statisticus.db", 1000)
+    before = column_sums("statisticus.db")
+
+    with pytest.raises(Interrupted):
+        core.upgrade_file("statisticus.db", batch=100, job=StopAfter(3))
+
+    conn = sqlite3.connect("statisticus.db")
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == core.V3_VERSION - 1
+    assert conn.execute("SELECT COUNT(*) FROM Statistik_v3").fetchone()[0] == 300
+    assert conn.execute("SELECT COUNT(*) FROM Statistik").fetchone()[0] == 1000
+    conn.close()
+
+    assert core.upgrade_file("statisticus.db", batch=100) == 700
+
+    conn = sqlite3.connect("statisticus.db")
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == len(core.MIGRATIONS)
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'Statistik_v3'").fetchone()[0] == 0
+    conn.close()
+    assert column_sums("statisticus.db") == before
+
+
+def test_upgrade_of_current_file_does_nothing(workdir):
+    baseline_database("statisticus.db", 10)
+    core.upgrade_file("statisticus.db")
+    assert core.upgrade_file("statisticus.db") == 0